@@ -0,0 +1,149 @@
+from kivy.graphics import Color, InstructionGroup, Line, Mesh, Rectangle
+from kivy.graphics.texture import Texture
+from kivy.metrics import dp
+from kivy.properties import ListProperty, NumericProperty, OptionProperty
+from kivy.uix.widget import Widget
+
+import heatmap
+
+
+class HeatmapWidget(Widget):
+    """Тепловая карта за год одной текстурой (см. heatmap.py).
+
+    Вместо сотен карточек — один Rectangle: обновление данных — это
+    blit_buffer в ту же текстуру, без создания виджетов и перекладки.
+    """
+    weeks = NumericProperty(heatmap.WEEKS)
+    cell = 4  # пикселей текстуры на ячейку, из них 1 — зазор
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._texture = None
+        with self.canvas:
+            self._color = Color(1, 1, 1, 0)
+            self._rect = Rectangle()
+        self.bind(pos=self._update_rect, size=self._update_rect)
+
+    def set_levels(self, cells, visible):
+        """cells — уровни из heatmap.compute, visible — число дней до сегодня"""
+        size = (self.weeks * self.cell, 7 * self.cell)
+        if self._texture is None or self._texture.size != size:
+            self._texture = Texture.create(size=size, colorfmt="rgba")
+            # Без сглаживания: ячейки остаются чёткими при растяжении
+            self._texture.mag_filter = "nearest"
+            self._texture.min_filter = "nearest"
+        pixels = heatmap.to_rgba(cells, visible, self.weeks, self.cell)
+        self._texture.blit_buffer(pixels, colorfmt="rgba", bufferfmt="ubyte")
+        self._rect.texture = self._texture
+        self._color.a = 1
+        self.canvas.ask_update()
+
+    def clear(self):
+        self._color.a = 0
+
+    def _update_rect(self, *args):
+        # Квадратные ячейки, карта по центру виджета
+        side = min(self.width / self.weeks, self.height / 7)
+        width, height = side * self.weeks, side * 7
+        self._rect.size = (width, height)
+        self._rect.pos = (self.x + (self.width - width) / 2,
+                          self.y + (self.height - height) / 2)
+
+
+class ChartWidget(Widget):
+    """Столбчатый или линейный график одним InstructionGroup.
+
+    Столбцы — два Mesh (серые дорожки и сами столбцы), линия — один
+    Line. Списки вершин переиспользуются: при новых данных той же
+    длины меняются только координаты, индексы не пересобираются.
+    """
+    mode = OptionProperty("bars", options=["bars", "line"])
+    values = ListProperty([])
+    # Значение, которому соответствует полная высота (0 — максимум values)
+    maximum = NumericProperty(0)
+    bar_color = ListProperty([0.2, 0.6, 1, 1])
+    track_color = ListProperty([0.9, 0.9, 0.9, 1])
+    spacing = 0.2  # доля шага между столбцами
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._track_vertices = []
+        self._bar_vertices = []
+        self._points = []
+        self._group = InstructionGroup()
+        self._track_color = Color(*self.track_color)
+        self._tracks = Mesh(mode="triangles")
+        self._bar_color = Color(*self.bar_color)
+        self._bars = Mesh(mode="triangles")
+        self._line = Line(width=dp(1.5), joint="round")
+        for instruction in (self._track_color, self._tracks,
+                            self._bar_color, self._bars, self._line):
+            self._group.add(instruction)
+        self.canvas.add(self._group)
+        self.bind(pos=self._redraw, size=self._redraw, values=self._redraw,
+                  maximum=self._redraw, mode=self._redraw,
+                  bar_color=self._update_colors, track_color=self._update_colors)
+
+    def set_data(self, values, maximum=0, mode=None):
+        """Новые данные одной перерисовкой"""
+        self.unbind(values=self._redraw, maximum=self._redraw, mode=self._redraw)
+        try:
+            self.values = values
+            self.maximum = maximum
+            if mode is not None:
+                self.mode = mode
+        finally:
+            self.bind(values=self._redraw, maximum=self._redraw, mode=self._redraw)
+        self._redraw()
+
+    def _update_colors(self, *args):
+        self._track_color.rgba = self.track_color
+        self._bar_color.rgba = self.bar_color
+
+    def _redraw(self, *args):
+        values = self.values
+        count = len(values)
+        top = self.maximum or max(values, default=0) or 1
+        step = self.width / count if count else 0
+        x0, y0, height = self.x, self.y, self.height
+
+        if self.mode == "bars" and count:
+            size = count * 16  # 4 вершины по (x, y, u, v)
+            if len(self._bar_vertices) != size:
+                self._track_vertices = [0.0] * size
+                self._bar_vertices = [0.0] * size
+                indices = []
+                for i in range(count):
+                    k = i * 4
+                    indices += (k, k + 1, k + 2, k, k + 2, k + 3)
+                self._tracks.indices = indices
+                self._bars.indices = indices
+            width = step * (1 - self.spacing)
+            for i, value in enumerate(values):
+                left = x0 + i * step + (step - width) / 2
+                right = left + width
+                bar_top = y0 + height * min(value / top, 1)
+                self._quad(self._track_vertices, i, left, right, y0, y0 + height)
+                self._quad(self._bar_vertices, i, left, right, y0, bar_top)
+            self._tracks.vertices = self._track_vertices
+            self._bars.vertices = self._bar_vertices
+            self._line.points = []
+        else:
+            if self._bar_vertices:
+                self._track_vertices = []
+                self._bar_vertices = []
+                for mesh in (self._tracks, self._bars):
+                    mesh.vertices = []
+                    mesh.indices = []
+            if len(self._points) != count * 2:
+                self._points = [0.0] * (count * 2)
+            for i, value in enumerate(values):
+                self._points[i * 2] = x0 + (i + 0.5) * step
+                self._points[i * 2 + 1] = y0 + height * min(value / top, 1)
+            self._line.points = self._points if count > 1 else []
+
+    @staticmethod
+    def _quad(vertices, index, left, right, bottom, top):
+        k = index * 16
+        vertices[k:k + 16] = (left, bottom, 0, 0, right, bottom, 0, 0,
+                              right, top, 0, 0, left, top, 0, 0)
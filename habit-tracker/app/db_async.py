@@ -0,0 +1,113 @@
+from concurrent.futures import ThreadPoolExecutor, CancelledError
+import threading
+
+from kivy.clock import Clock
+
+from app import db
+
+# Запросы к БД выполняются в фоновых потоках (у каждого своё
+# подключение на чтение, см. db.get_connection), а результат
+# возвращается в главный цикл Kivy через Clock.
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="db")
+_lock = threading.Lock()
+_active = {}  # key -> DbRequest, последний запрос с этим ключом
+
+
+class DbRequest:
+    """Фоновый запрос. Колбэки вызываются в главном потоке, если запрос
+    не отменён и не вытеснен более новым запросом с тем же ключом."""
+
+    def __init__(self, key, on_result, on_error):
+        self.key = key
+        self.on_result = on_result
+        self.on_error = on_error
+        self.future = None
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+        if self.future is not None:
+            self.future.cancel()
+
+    def _done(self, future):
+        # Вызывается в рабочем потоке — переносим обработку в главный
+        Clock.schedule_once(lambda dt: self._deliver(future))
+
+    def _deliver(self, future):
+        with _lock:
+            if self.key is not None and _active.get(self.key) is self:
+                del _active[self.key]
+        if self.cancelled:
+            return
+        try:
+            result = future.result()
+        except CancelledError:
+            return
+        except Exception as e:
+            print(f"❌ Ошибка фонового запроса к БД: {e}")
+            if self.on_error:
+                self.on_error(e)
+            return
+        if self.on_result:
+            self.on_result(result)
+
+
+def submit(fn, *args, on_result=None, on_error=None, key=None, **kwargs):
+    """Выполняет fn(*args, **kwargs) в фоне.
+
+    key — например, имя экрана: новый запрос с тем же ключом отменяет
+    предыдущий, и его результат уже не придёт.
+    """
+    request = DbRequest(key, on_result, on_error)
+    if key is not None:
+        with _lock:
+            previous = _active.get(key)
+            _active[key] = request
+        if previous is not None:
+            previous.cancel()
+    request.future = _executor.submit(fn, *args, **kwargs)
+    request.future.add_done_callback(request._done)
+    return request
+
+
+def cancel(key):
+    with _lock:
+        request = _active.pop(key, None)
+    if request is not None:
+        request.cancel()
+
+
+def shutdown(wait=True):
+    with _lock:
+        requests = list(_active.values())
+        _active.clear()
+    for request in requests:
+        request.cancel()
+    _executor.shutdown(wait=wait)
+
+
+def subscribe(handler, kinds=None):
+    """Подписка экрана на изменения в БД (db.events).
+
+    События из любых потоков копятся и передаются в handler(changes)
+    одним списком без повторов в главном потоке — не чаще раза за кадр.
+    Возвращает функцию отписки.
+    """
+    pending = []
+    pending_lock = threading.Lock()
+
+    def flush(dt):
+        with pending_lock:
+            changes = list(dict.fromkeys(pending))
+            pending.clear()
+        if changes:
+            handler(changes)
+
+    def on_change(event):
+        with pending_lock:
+            first = not pending
+            pending.append(event)
+        if first:
+            Clock.schedule_once(flush)
+
+    return db.events.subscribe(on_change, kinds)
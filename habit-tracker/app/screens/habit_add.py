@@ -46,13 +46,8 @@ class HabitAddScreen(MDScreen):
         self.go_back_and_refresh()
 
     def go_back_and_refresh(self):
-        if self.manager and "habit_list" in self.manager.screen_names:
-            # Получаем экран списка и обновляем его
-            habit_list_screen = self.manager.get_screen("habit_list")
-            self.manager.current = "habit_list"
-            # Даем время на переход и затем обновляем список
-            from kivy.clock import Clock
-            Clock.schedule_once(lambda dt: habit_list_screen.load_habits(), 0.1)
+        # Список обновится сам по событию HABIT_ADDED из db
+        self.go_back()
 
     def select_repeat(self, option):
         print(f"Выбрано повторение: {option}")
@@ -1,8 +1,7 @@
 from kivymd.uix.screen import MDScreen
 from kivy.lang import Builder
 from kivy.properties import StringProperty
-from kivy.clock import Clock
-from app import db
+from app import db, db_async
 
 
 class HabitEditScreen(MDScreen):
@@ -18,18 +17,29 @@ class HabitEditScreen(MDScreen):
         print(f"🔍 Загрузка экрана редактирования, habit_id={self.habit_id}")
 
         if self.habit_id:
-            Clock.schedule_once(lambda dt: self.load_habit_data(), 0.1)
+            self.load_habit_data()
         else:
             self._is_loading = False
 
     def on_leave(self):
+        db_async.cancel("habit_edit")
         self._is_loading = False
 
     def load_habit_data(self):
+        db_async.submit(
+            self.fetch_habit, self.habit_id,
+            key="habit_edit",
+            on_result=self.show_habit_data,
+            on_error=lambda e: self.show_habit_data(None)
+        )
+
+    @staticmethod
+    def fetch_habit(habit_id):
+        # Выполняется в фоновом потоке
+        return db.get_habit(habit_id, columns=("name", "goal", "repeat"))
+
+    def show_habit_data(self, current_habit):
         try:
-            habits = db.get_habits()
-            current_habit = next((h for h in habits if h['id'] == self.habit_id), None)
-
             if current_habit:
                 print(f"✅ Загружена привычка: {current_habit['name']}")
                 self.ids.habit_title.text = current_habit.get('name', '')
@@ -78,9 +88,10 @@ class HabitEditScreen(MDScreen):
             return
 
         try:
-            # Обновляем привычку
-            db.delete_habit(self.habit_id)
-            new_id = db.add_habit(name, goal, self.habit_repeat)
+            # Обновляем привычку на месте: id, отметки и напоминание сохраняются
+            if not db.update_habit(self.habit_id, name=name, goal=goal, repeat=self.habit_repeat):
+                print("❌ Привычка не обновлена")
+                return
             print(f"💾 Привычка обновлена: {name}")
             self.go_back()
 
@@ -91,19 +102,9 @@ class HabitEditScreen(MDScreen):
         print("🔙 Возврат к списку")
         if self.manager:
             self.manager.transition.direction = 'right'
+            # Список привычек обновится сам по событиям из db
             self.manager.current = "habit_list"
 
-            # Обновляем список привычек
-            Clock.schedule_once(lambda dt: self.refresh_habit_list(), 0.2)
-
-    def refresh_habit_list(self):
-        try:
-            if self.manager and self.manager.has_screen("habit_list"):
-                habit_list_screen = self.manager.get_screen("habit_list")
-                habit_list_screen.load_habits()
-        except Exception as e:
-            print(f"❌ Ошибка обновления списка: {e}")
-
     def delete_habit(self):
         if not self.habit_id:
             return
@@ -1,201 +1,159 @@
 from kivymd.uix.screen import MDScreen
-from kivymd.uix.label import MDLabel
 from kivymd.uix.card import MDCard
-from kivymd.uix.boxlayout import MDBoxLayout
-from kivymd.uix.button import MDIconButton, MDRoundFlatIconButton
-from datetime import datetime
-from app import db
+from kivy.uix.recycleview.views import RecycleDataViewBehavior
+from kivy.properties import BooleanProperty, NumericProperty, ObjectProperty, StringProperty
+from app import db, db_async
+
+
+class HabitCard(RecycleDataViewBehavior, MDCard):
+    """Карточка привычки в RecycleView, разметка — в habit_tracker.kv"""
+    index = NumericProperty(0)
+    habit_id = NumericProperty(0)
+    name = StringProperty("")
+    goal_text = StringProperty("")
+    current_streak = NumericProperty(0)
+    total_done = NumericProperty(0)
+    done_today = BooleanProperty(False)
+    skeleton = BooleanProperty(False)
+    screen = ObjectProperty(None, allownone=True)
+
+    def refresh_view_attrs(self, rv, index, data):
+        self.index = index
+        return super().refresh_view_attrs(rv, index, data)
+
+    def on_done(self):
+        if not self.screen or self.skeleton:
+            return
+        if self.done_today:
+            self.screen.show_info_message("Уже выполнено сегодня!")
+        else:
+            self.screen.toggle_habit_done(self.habit_id)
 
 
 class HabitListScreen(MDScreen):
+    _index_by_id = {}  # habit_id -> позиция в habit_list.data
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self._dirty = True  # список нужно перечитать целиком
+        self._own_checkins = set()  # отметки, уже применённые к карточкам
+        db_async.subscribe(
+            self.on_db_changes,
+            db.events.HABIT_EVENTS + db.events.LOG_EVENTS + (db.events.STREAKS_REBUILT,)
+        )
 
     def on_enter(self, *args):
         print("🔍 HabitListScreen: on_enter вызван")
-        from kivy.clock import Clock
-        Clock.schedule_once(lambda dt: self.load_habits(), 0.1)
+        if self._dirty:
+            self.load_habits()
+
+    def on_db_changes(self, changes):
+        # Добавление/удаление меняет состав списка — перечитываем его
+        # (сразу, если экран открыт, иначе при входе). Остальные
+        # изменения затрагивают отдельные карточки.
+        changed_ids = set()
+        for change in changes:
+            if change.kind in (db.events.HABIT_ADDED, db.events.HABIT_DELETED,
+                               db.events.STREAKS_REBUILT):
+                self._dirty = True
+            elif change.kind == db.events.LOG_ADDED and change.habit_id in self._own_checkins:
+                self._own_checkins.discard(change.habit_id)
+            else:
+                changed_ids.add(change.habit_id)
 
-    def load_habits(self):
-        print("🔍 Загрузка привычек...")
-        container = self.ids.get('habit_list')
-        if not container:
-            print("❌ Не найден контейнер habit_list")
+        if self._dirty:
+            if self.manager and self.manager.current == self.name:
+                self.load_habits()
             return
+        if changed_ids:
+            self.refresh_habits(changed_ids)
 
-        print("✅ Контейнер найден, загружаем привычки...")
-        container.clear_widgets()
-
-        try:
-            habits = db.get_habits()
-            print(f"📊 Получено привычек из БД: {len(habits)}")
-        except Exception as e:
-            print(f"❌ Ошибка БД: {e}")
-            habits = []
-
-        if not habits:
-            lbl = MDLabel(
-                text="Пока нет привычек. Нажмите +, чтобы добавить.",
-                halign="center",
-                size_hint_y=None,
-                height="48dp"
-            )
-            container.add_widget(lbl)
+    def refresh_habits(self, habit_ids):
+        habit_ids = [habit_id for habit_id in habit_ids if habit_id in self._index_by_id]
+        if not habit_ids:
             return
-
-        for habit in habits:
-            # Получаем статистику для отображения текущей серии
-            stats = db.get_habit_stats(habit["id"])
-
-            card = self.create_habit_card(habit, stats)
-            container.add_widget(card)
-
-    def create_habit_card(self, habit, stats):
-        card = MDCard(
-            orientation="vertical",
-            padding="16dp",
-            size_hint_y=None,
-            height="120dp",
-            radius=[12],
-            ripple_behavior=True,
-            elevation=2
+        db_async.submit(
+            lambda: [db.get_habit_summary(habit_id) for habit_id in habit_ids],
+            on_result=lambda habits: [self.patch_habit(habit) for habit in habits if habit]
         )
 
-        # Верхняя часть - информация о привычке
-        top_box = MDBoxLayout(orientation="horizontal", size_hint_y=0.6)
-
-        # Левая часть - название и цель
-        info_box = MDBoxLayout(orientation="vertical", size_hint_x=0.8)
-
-        # Название привычки
-        name_label = MDLabel(
-            text=habit["name"],
-            halign="left",
-            font_style="Subtitle1",
-            theme_text_color="Primary",
-            size_hint_y=0.6
-        )
-
-        # Цель привычки
-        goal_label = MDLabel(
-            text=f"Цель: {habit.get('goal', 'Не указана')}",
-            halign="left",
-            font_style="Caption",
-            theme_text_color="Secondary",
-            size_hint_y=0.4
-        )
-
-        info_box.add_widget(name_label)
-        info_box.add_widget(goal_label)
-
-        # Правая часть - простая статистика (текстом)
-        stats_box = MDBoxLayout(orientation="vertical", size_hint_x=0.2, spacing="2dp")
-
-        # Текущая серия (просто текст)
-        streak_label = MDLabel(
-            text=f"Текущая серия: {stats.get('current_streak', 0)}",
-            halign="center",
-            font_style="Caption",
-            theme_text_color="Primary",
-            size_hint_y=0.5
-        )
-
-        # Общее количество (просто текст)
-        total_label = MDLabel(
-            text=f"Самая длинная серия: {stats.get('total_done', 0)}",
-            halign="center",
-            font_style="Caption",
-            theme_text_color="Primary",
-            size_hint_y=0.5
-        )
-
-        stats_box.add_widget(streak_label)
-        stats_box.add_widget(total_label)
-
-        top_box.add_widget(info_box)
-        top_box.add_widget(stats_box)
-
-        # Нижняя часть - кнопки действий
-        bottom_box = MDBoxLayout(
-            orientation="horizontal",
-            size_hint_y=0.4,
-            spacing="8dp"
-        )
+    def load_habits(self):
+        print("🔍 Загрузка привычек...")
+        rv = self.ids.get('habit_list')
+        if not rv:
+            print("❌ Не найден контейнер habit_list")
+            return
 
-        # Кнопка "Выполнено сегодня" - проверяем, выполнена ли уже сегодня
-        today = datetime.now().strftime('%Y-%m-%d')
-        is_done_today = today in stats.get('last_30_days', [])
-
-        if is_done_today:
-            # Если уже выполнено сегодня - показываем кнопку с галочкой
-            done_button = MDRoundFlatIconButton(
-                text="✔ Выполнено сегодня",
-                icon="check",
-                size_hint_x=0.5,
-                on_release=lambda x, hid=habit["id"]: self.show_info_message("Уже выполнено сегодня!"),
-                text_color=(0.4, 0.4, 0.4, 1),  # Серый цвет
-                line_color=(0.4, 0.4, 0.4, 0.5)  # Серая рамка
-            )
-        else:
-            # Если еще не выполнено - активная кнопка
-            done_button = MDRoundFlatIconButton(
-                text="Выполнено сегодня",
-                icon="check",
-                size_hint_x=0.5,
-                on_release=lambda x, hid=habit["id"]: self.toggle_habit_done(hid),
-                text_color=(0.2, 0.7, 0.3, 1),  # Зеленый цвет
-                line_color=(0.2, 0.7, 0.3, 0.5)  # Зеленая рамка
-            )
-
-        # Контейнер для кнопок редактирования и статистики
-        actions_box = MDBoxLayout(
-            orientation="horizontal",
-            size_hint_x=0.5,
-            spacing="4dp"
-        )
+        self._dirty = False
 
-        # Кнопка редактирования
-        edit_btn = MDIconButton(
-            icon="pencil",
-            on_release=lambda x, hid=habit["id"]: self.edit_habit(hid),
-            theme_icon_color="Custom",
-            icon_color=(0.2, 0.6, 0.8, 1)
-        )
+        # Пока данные грузятся в фоне, показываем заглушки карточек
+        if not rv.data:
+            self.show_skeleton()
 
-        # Кнопка статистики
-        stats_btn = MDIconButton(
-            icon="chart-line",
-            on_release=lambda x, hid=habit["id"]: self.open_stats(hid),
-            theme_icon_color="Custom",
-            icon_color=(0.3, 0.7, 0.3, 1)
+        db_async.submit(
+            db.get_dashboard,
+            key="habit_list",
+            on_result=self.show_habits,
+            on_error=lambda e: self.show_habits([])
         )
 
-        actions_box.add_widget(edit_btn)
-        actions_box.add_widget(stats_btn)
-
-        bottom_box.add_widget(done_button)
-        bottom_box.add_widget(actions_box)
+    def show_skeleton(self, count=3):
+        self.ids.habit_list.data = [{"skeleton": True, "screen": self} for _ in range(count)]
+        self.ids.empty_label.opacity = 0
 
-        # Собираем карточку
-        card.add_widget(top_box)
-        card.add_widget(bottom_box)
+    def show_habits(self, habits):
+        rv = self.ids.get('habit_list')
+        if not rv:
+            return
 
-        return card
+        print(f"📊 Получено привычек из БД: {len(habits)}")
+        # Виджеты не пересоздаются: RecycleView лишь раздаёт новые
+        # словари уже созданным карточкам
+        rv.data = [self.habit_to_data(habit) for habit in habits]
+        self._index_by_id = {habit["id"]: i for i, habit in enumerate(habits)}
+        self.ids.empty_label.opacity = 0 if habits else 1
+
+    def habit_to_data(self, habit):
+        # Статистика уже пришла вместе с привычкой из get_dashboard()
+        return {
+            "habit_id": habit["id"],
+            "name": habit["name"],
+            "goal_text": f"Цель: {habit.get('goal', 'Не указана')}",
+            "current_streak": habit.get('current_streak', 0),
+            "total_done": habit.get('total_done', 0),
+            "done_today": habit.get('done_today', False),
+            "skeleton": False,
+            "screen": self,
+        }
 
     def toggle_habit_done(self, habit_id):
         print(f"✅ Отметка выполнения привычки {habit_id}")
-        try:
-            result = db.log_habit_done(habit_id)
-            if result:
-                print(f"✅ Привычка {habit_id} отмечена выполненной")
-                # Обновляем список привычек
-                from kivy.clock import Clock
-                Clock.schedule_once(lambda dt: self.load_habits(), 0.1)
-            else:
-                print(f"⚠️ Привычка уже была отмечена сегодня")
-                # Обновляем список, чтобы показать правильный статус
-                from kivy.clock import Clock
-                Clock.schedule_once(lambda dt: self.load_habits(), 0.1)
-        except Exception as e:
-            print(f"❌ Ошибка отметки привычки: {e}")
+        self._own_checkins.add(habit_id)
+        db_async.submit(
+            db.check_in, habit_id,
+            on_result=self.update_habit_card,
+            on_error=lambda e: print(f"❌ Ошибка отметки привычки: {e}")
+        )
+
+    def update_habit_card(self, habit):
+        if not habit:
+            print("⚠️ Не удалось отметить привычку")
+            return
+        # Из _own_checkins отметку убирает событие LOG_ADDED: при
+        # групповой записи (db.DURABILITY) оно приходит после результата
+        self.patch_habit(habit)
+        print(f"✅ Привычка {habit['id']} отмечена выполненной")
+
+    def patch_habit(self, habit):
+        # Меняем только словарь этой привычки: RecycleView обновит
+        # одну карточку, остальной список не трогается
+        rv = self.ids.get('habit_list')
+        index = self._index_by_id.get(habit["id"])
+        if rv is None or index is None or index >= len(rv.data) \
+                or rv.data[index].get("habit_id") != habit["id"]:
+            self.load_habits()
+            return
+        rv.data[index] = self.habit_to_data(habit)
 
     def show_info_message(self, message):
         print(f"ℹ️ {message}")
@@ -1,12 +1,12 @@
-from kivymd.uix.boxlayout import MDBoxLayout
 from kivymd.uix.screen import MDScreen
-from kivy.properties import StringProperty, NumericProperty, ListProperty
+from kivy.properties import (BooleanProperty, StringProperty, NumericProperty,
+                             OptionProperty)
 from kivymd.uix.label import MDLabel
 from kivymd.uix.card import MDCard
-from kivy.graphics import Color, Rectangle
 from kivy.metrics import dp
-from app import db
-from datetime import datetime, timedelta
+from app import db, db_async
+from app.charts import ChartWidget, HeatmapWidget  # регистрирует виджеты для habit_stats.kv
+import heatmap
 
 
 class HabitStatsScreen(MDScreen):
@@ -14,179 +14,198 @@ class HabitStatsScreen(MDScreen):
     current_streak = NumericProperty(0)
     longest_streak = NumericProperty(0)
     total_done = NumericProperty(0)
-    history = ListProperty([])
+    # Тепловая карта: эта привычка или все сразу
+    heatmap_all = BooleanProperty(False)
+    # График прогресса: период в днях и ряд ("count" или "rate")
+    chart_days = NumericProperty(7)
+    chart_series = OptionProperty("count", options=["count", "rate"])
+    chart_caption = StringProperty("")
 
     habit_id = None
 
+    # История подгружается страницами по мере прокрутки
+    HISTORY_PAGE_SIZE = 20
+    _history_before = None   # дата последней показанной отметки
+    _history_loading = False
+    _history_done = False
+
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        db_async.subscribe(
+            self.on_db_changes,
+            db.events.HABIT_EVENTS + db.events.LOG_EVENTS + (db.events.STREAKS_REBUILT,)
+        )
+
+    def on_db_changes(self, changes):
+        # Перечитываем, только если экран открыт и изменения касаются его привычки
+        if not self.habit_id or not self.manager or self.manager.current != self.name:
+            return
+        if any(change.habit_id in (self.habit_id, None) for change in changes):
+            self.load_data()
+        elif self.heatmap_all:
+            # Общая карта зависит и от других привычек
+            self.load_heatmap()
+
     def on_pre_enter(self, *args):
         if not self.habit_id:
             return
 
-        # Получаем данные привычки
-        habits = db.get_habits()
-        current_habit = next((h for h in habits if h['id'] == self.habit_id), None)
+        # Сначала показываем пустой экран, данные подставим по готовности
+        self.habit_name = "Загрузка..."
+        self.set_stats_from_data(db.empty_stats())
+        self.clear_heatmap()
+        self.reset_history()
+        self.clear_chart()
 
-        if current_habit:
-            self.habit_name = current_habit['name']
+        self.load_data()
 
-            # Получаем статистику
-            stats = db.get_habit_stats(self.habit_id)
+    def load_data(self):
+        db_async.submit(
+            self.fetch_data, self.habit_id,
+            key="habit_stats",
+            on_result=self.show_data
+        )
+        self.load_heatmap()
+        self.load_chart()
+
+    @staticmethod
+    def fetch_data(habit_id):
+        # Выполняется в фоновом потоке
+        current_habit = db.get_habit(habit_id, columns=("name",))
+        if not current_habit:
+            return None, None
+        return current_habit, db.get_habit_stats(habit_id)
+
+    def show_data(self, result):
+        current_habit, stats = result
+        if current_habit and current_habit['id'] == self.habit_id:
+            self.habit_name = current_habit['name']
             self.set_stats_from_data(stats)
 
             # Обновляем визуальные элементы
-            self.populate_calendar()
             self.populate_history()
-            self.create_progress_chart()
+
+    def on_leave(self, *args):
+        db_async.cancel("habit_stats")
+        db_async.cancel("habit_stats_heatmap")
+        db_async.cancel("habit_stats_chart")
+        db_async.cancel("habit_stats_history")
 
     def set_stats_from_data(self, data: dict):
         self.current_streak = data.get('current_streak', 0)
         self.longest_streak = data.get('longest_streak', 0)
         self.total_done = data.get('total_done', 0)
-        self.history = data.get('completions', [])
-        self.last_30_days = data.get('last_30_days', [])
-
-    def populate_calendar(self):
-        grid = self.ids.get('calendar_grid')
-        if not grid:
-            return
-
-        grid.clear_widgets()
-
-        # Получаем текущую дату
-        today = datetime.now().date()
-
-        # Определяем первый день текущего месяца
-        first_day_of_month = today.replace(day=1)
-
-        # Определяем последний день текущего месяца
-        if today.month == 12:
-            last_day_of_month = today.replace(year=today.year + 1, month=1, day=1) - timedelta(days=1)
-        else:
-            last_day_of_month = today.replace(month=today.month + 1, day=1) - timedelta(days=1)
-
-        # Определяем день недели первого дня (0=понедельник, 6=воскресенье)
-        start_weekday = first_day_of_month.weekday()
-
-        # Добавляем пустые ячейки для выравнивания
-        for i in range(start_weekday):
-            empty_box = MDBoxLayout(
-                size_hint=(None, None),
-                size=(dp(32), dp(32))
-            )
-            grid.add_widget(empty_box)
-
-        # Заполняем числами текущего месяца
-        current_day = first_day_of_month
-        while current_day <= last_day_of_month:
-            date_str = current_day.strftime('%Y-%m-%d')
-
-            # Проверяем выполнение
-            is_completed = date_str in self.last_30_days
-
-            # Цвета
-            if is_completed:
-                bg_color = [0.2, 0.6, 1, 1]  # Синий
-                text_color = [1, 1, 1, 1]  # Белый
-            else:
-                bg_color = [0.95, 0.95, 0.95, 1]  # Светло-серый
-                text_color = [0.5, 0.5, 0.5, 1]  # Серый
-
-            # Создаем карточку дня
-            day_card = MDCard(
-                size_hint=(None, None),
-                size=(dp(32), dp(32)),
-                radius=dp(4),
-                md_bg_color=bg_color,
-                elevation=1 if is_completed else 0,
-                padding=0
-            )
-
-            # Метка с числом
-            label = MDLabel(
-                text=str(current_day.day),
-                halign='center',
-                valign='middle',
-                theme_text_color='Custom',
-                text_color=text_color,
-                font_size='10sp',
-                bold=True
-            )
-            day_card.add_widget(label)
-            grid.add_widget(day_card)
 
-            # Переходим к следующему дню
-            current_day += timedelta(days=1)
-
-        # Добавляем пустые ячейки в конце если нужно
-        total_cells = start_weekday + last_day_of_month.day
-        remaining_cells = (7 - (total_cells % 7)) % 7
+    def load_heatmap(self):
+        db_async.submit(
+            self.fetch_heatmap, self.habit_id, self.heatmap_all,
+            key="habit_stats_heatmap",
+            on_result=self.show_heatmap
+        )
 
-        for i in range(remaining_cells):
-            empty_box = MDBoxLayout(
-                size_hint=(None, None),
-                size=(dp(32), dp(32))
-            )
-            grid.add_widget(empty_box)
+    @staticmethod
+    def fetch_heatmap(habit_id, all_habits):
+        # Выполняется в фоновом потоке: выборка по индексу дней и
+        # раскладка по ячейкам (NumPy, если есть)
+        today = db.streaks.today_day()
+        start = heatmap.grid_start(today)
+        days = db.get_completion_days(start, today, None if all_habits else habit_id)
+        # Полный цвет — все привычки отмечены в этот день
+        scale = max(len(db.get_dashboard()), 1) if all_habits else 1
+        _, cells = heatmap.compute(days, today, scale=scale)
+        return cells, today - start + 1
+
+    def show_heatmap(self, result):
+        widget = self.ids.get('heatmap')
+        if widget:
+            widget.set_levels(*result)
+
+    def clear_heatmap(self):
+        widget = self.ids.get('heatmap')
+        if widget:
+            widget.clear()
+
+    def toggle_heatmap_scope(self):
+        self.heatmap_all = not self.heatmap_all
+        self.load_heatmap()
+
+    def load_chart(self):
+        db_async.submit(
+            db.get_chart_series, self.habit_id, self.chart_days, self.chart_series,
+            key="habit_stats_chart",
+            on_result=self.show_chart
+        )
 
-    def create_progress_chart(self):
-        container = self.ids.get('chart_container')
-        if not container:
+    def show_chart(self, points):
+        chart = self.ids.get('chart')
+        if not chart:
             return
+        rate = self.chart_series == "rate"
+        # Доля рисуется линией от 0 до 1, количество — столбцами
+        chart.set_data([value for _, value in points],
+                       maximum=1 if rate else 0,
+                       mode="line" if rate else "bars")
+        self.chart_caption = f"с {points[0][0].strftime('%d.%m.%Y')}" if points else ""
+
+    def clear_chart(self):
+        chart = self.ids.get('chart')
+        if chart:
+            chart.set_data([])
+        self.chart_caption = ""
+
+    def set_chart_days(self, days):
+        self.chart_days = days
+        self.load_chart()
+
+    def toggle_chart_series(self):
+        self.chart_series = "count" if self.chart_series == "rate" else "rate"
+        self.load_chart()
+
+    def reset_history(self):
+        db_async.cancel("habit_stats_history")
+        container = self.ids.get('history_list')
+        if container:
+            container.clear_widgets()
+        self._history_before = None
+        self._history_loading = False
+        self._history_done = False
 
-        container.clear_widgets()
+    def populate_history(self):
+        self.reset_history()
+        self.load_history_page()
 
-        # Создаем простой столбчатый график
-        chart_layout = MDBoxLayout(
-            orientation='horizontal',
-            spacing=dp(2),
-            size_hint_y=1
+    def load_history_page(self):
+        if self._history_loading or self._history_done or not self.habit_id:
+            return
+        self._history_loading = True
+        db_async.submit(
+            db.get_history_page, self.habit_id, self._history_before,
+            self.HISTORY_PAGE_SIZE,
+            key="habit_stats_history",
+            on_result=self.append_history,
+            on_error=self.history_error
         )
 
-        # Данные за последние 7 дней
-        today = datetime.now().date()
-        for i in range(7):
-            day_date = today - timedelta(days=6 - i)
-            date_str = day_date.strftime('%Y-%m-%d')
+    def on_history_scroll(self, scroll_view):
+        # Близко к низу списка — подгружаем следующую страницу
+        if scroll_view.scroll_y <= 0.1:
+            self.load_history_page()
 
-            # Высота столбца
-            height_multiplier = 1 if date_str in self.last_30_days else 0.1
+    def history_error(self, e):
+        # Снимаем флаг, иначе следующая прокрутка не загрузит страницу
+        self._history_loading = False
+        print(f"❌ Ошибка загрузки истории: {e}")
 
-            day_column = MDBoxLayout(
-                orientation='vertical',
-                size_hint_x=1,
-                spacing=dp(2)
-            )
-
-            # Столбец графика
-            bar = MDCard(
-                size_hint_y=height_multiplier,
-                radius=dp(2),
-                md_bg_color=(0.2, 0.6, 1, 1) if date_str in self.last_30_days else (0.9, 0.9, 0.9, 1)
-            )
-
-            # Подпись дня недели
-            day_label = MDLabel(
-                text=day_date.strftime('%a'),
-                halign='center',
-                font_style='Caption',
-                size_hint_y=None,
-                height=dp(20)
-            )
-
-            day_column.add_widget(bar)
-            day_column.add_widget(day_label)
-            chart_layout.add_widget(day_column)
-
-        container.add_widget(chart_layout)
-
-    def populate_history(self):
+    def append_history(self, page):
+        self._history_loading = False
         container = self.ids.get('history_list')
         if not container:
             return
 
-        container.clear_widgets()
+        if len(page) < self.HISTORY_PAGE_SIZE:
+            self._history_done = True
 
-        if not self.history:
+        if not page and self._history_before is None:
             label = MDLabel(
                 text="Пока нет выполнений",
                 halign='center',
@@ -195,12 +214,8 @@ class HabitStatsScreen(MDScreen):
             container.add_widget(label)
             return
 
-        # Показываем последние 10 выполнений
-        recent_completions = sorted(self.history, reverse=True)[:10]
-
-        for completion_date in recent_completions:
-            date_obj = datetime.strptime(completion_date, '%Y-%m-%d')
-            formatted_date = date_obj.strftime('%d.%m.%Y')
+        for completion_date in page:
+            formatted_date = completion_date.strftime('%d.%m.%Y')
 
             card = MDCard(
                 size_hint_y=None,
@@ -216,6 +231,9 @@ class HabitStatsScreen(MDScreen):
             card.add_widget(label)
             container.add_widget(card)
 
+        if page:
+            self._history_before = page[-1]
+
     def go_back(self):
         if self.manager and 'habit_list' in self.manager.screen_names:
             self.manager.current = 'habit_list'
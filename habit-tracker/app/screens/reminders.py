@@ -1,7 +1,7 @@
 from kivymd.uix.screen import MDScreen
 from kivy.properties import BooleanProperty, StringProperty, ListProperty, NumericProperty
-from app import db
-import json
+from app import db, db_async
+import streaks
 
 
 class RemindersScreen(MDScreen):
@@ -23,26 +23,27 @@ class RemindersScreen(MDScreen):
 
     def load_existing_reminder(self):
         print(f"🔍 Загрузка напоминания для habit_id={self.habit_id}")
+        db_async.submit(
+            db.get_reminder, self.habit_id,
+            key="reminders",
+            on_result=self.show_reminder
+        )
 
-        reminder_data = db.get_reminder(self.habit_id)
-        if reminder_data:
+    def show_reminder(self, reminder_data):
+        if reminder_data and reminder_data.get('habit_id') == self.habit_id:
             # Заполняем поля данными из БД
             self.reminder_time = reminder_data.get('time', '08:00')
             self.repeat_option = reminder_data.get('repeat', 'daily')  # исправлено на английские ключи
 
-            # Обрабатываем дни (они могут быть в формате JSON строки)
-            days = reminder_data.get('days', [])
-            if isinstance(days, str):
-                try:
-                    days = json.loads(days)
-                except:
-                    days = []
-            self.days_selected = days
+            # Дни хранятся битовой маской (понедельник — бит 0)
+            days = reminder_data.get('days') or 0
+            self.days_selected = [name for index, name in enumerate(streaks.WEEKDAY_NAMES)
+                                  if days >> index & 1]
 
             self.vibration_enabled = bool(reminder_data.get('vibration', False))
             self.sound_enabled = bool(reminder_data.get('sound', True))
             self.reminder_text = reminder_data.get('text', 'Не забыть выполнить привычку')
-            self.reminder_enabled = True
+            self.reminder_enabled = bool(reminder_data.get('enabled', True))
 
             print(f"✅ Загружены настройки напоминания: {self.reminder_time}, {self.repeat_option}")
 
@@ -175,10 +176,11 @@ class RemindersScreen(MDScreen):
             habit_id=self.habit_id,
             time=self.reminder_time,
             repeat=self.repeat_option,
-            days=self.days_selected,
+            days=list(self.days_selected),
             vibration=self.vibration_enabled,
             sound=self.sound_enabled,
-            text=self.reminder_text
+            text=self.reminder_text,
+            enabled=self.reminder_enabled
         )
         print(f"✅ Напоминание сохранено для привычки {self.habit_id}")
 
@@ -2,13 +2,17 @@ from kivymd.uix.screen import MDScreen
 from kivy.properties import BooleanProperty, StringProperty
 from kivymd.app import MDApp
 from kivy.clock import Clock
-from app import db
+from app import db, db_async
+from datetime import datetime
+import os
 
 
 class SettingsScreen(MDScreen):
     dark_theme = BooleanProperty(False)
     primary_color = StringProperty("#6750A4")
     _content_loaded = BooleanProperty(False)
+    # Ход экспорта/импорта для подписи под кнопками
+    data_status = StringProperty("")
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
@@ -29,8 +33,10 @@ class SettingsScreen(MDScreen):
             self.manager.current = 'habit_list'
 
     def load_settings(self):
+        db_async.submit(db.get_settings, key="settings", on_result=self.show_settings)
+
+    def show_settings(self, settings):
         try:
-            settings = db.get_settings()
             if settings:
                 self.dark_theme = settings.get('dark_theme', False)
                 self.primary_color = settings.get('primary_color', '#6750A4')
@@ -115,10 +121,53 @@ class SettingsScreen(MDScreen):
             print(f"❌ Ошибка сохранения настроек: {e}")
 
     def export_data(self):
-        print("📤 Экспорт данных (заглушка)")
+        app = MDApp.get_running_app()
+        folder = app.user_data_dir if app else "."
+        path = os.path.join(folder, f"habits-{datetime.now():%Y%m%d-%H%M%S}.jsonl.gz")
+        self.data_status = "Экспорт..."
+        db_async.submit(
+            db.export_data, path, progress=self.report_progress,
+            key="export",
+            on_result=lambda count: self.finish_export(path, count)
+        )
+
+    def report_progress(self, done, total=None):
+        # Вызывается в фоновом потоке
+        text = f"Обработано записей: {done}" + (f" из {total}" if total else "")
+        Clock.schedule_once(lambda dt: setattr(self, "data_status", text))
+
+    def finish_export(self, path, count):
+        if count is None:
+            self.data_status = "Не удалось экспортировать данные"
+        else:
+            self.data_status = f"Экспортировано записей: {count}\n{path}"
 
     def import_data(self):
-        print("📥 Импорт данных (заглушка)")
+        # Файла выбора нет — берём последнюю резервную копию из export_data
+        app = MDApp.get_running_app()
+        folder = app.user_data_dir if app else "."
+        backups = sorted(name for name in os.listdir(folder)
+                         if name.startswith("habits-") and name.endswith((".jsonl.gz", ".csv.gz",
+                                                                          ".jsonl", ".csv")))
+        if not backups:
+            self.data_status = "Нет резервных копий для импорта"
+            return
+        path = os.path.join(folder, backups[-1])
+        self.data_status = "Импорт..."
+        db_async.submit(
+            db.import_data, path,
+            progress=self.report_progress,
+            key="import",
+            on_result=self.finish_import
+        )
+
+    def finish_import(self, result):
+        if result is None:
+            self.data_status = "Не удалось импортировать данные"
+        else:
+            self.data_status = (f"Импортировано: привычек {result['habits']}, "
+                                f"отметок {result['logs']} "
+                                f"(уже были: {result['duplicates']})")
 
     def show_privacy_policy(self):
         print("🔒 Политика конфиденциальности")
\ No newline at end of file
@@ -5,7 +5,7 @@ package.domain = org.example
 source.dir = .
 source.include_exts = py,kv,png,jpg,db,json
 version = 1.0
-requirements = python3,kivy==2.3.0,kivymd==1.1.1,sqlite3
+requirements = python3,kivy==2.3.0,kivymd==1.1.1,sqlite3,numpy,plyer
 orientation = portrait
 fullscreen = 0
 
@@ -18,5 +18,5 @@ android.sdk = 31
 android.ndk = 25b
 android.arch = armeabi-v7a
 android.entrypoint = main.py
-android.requirements = python3,kivy,kivymd,sqlite3
+android.requirements = python3,kivy,kivymd,sqlite3,numpy,plyer
 android.permissions = INTERNET,VIBRATE
@@ -0,0 +1,73 @@
+"""Кэш результатов чтения из базы.
+
+Ключи — кортежи, первый элемент которых — сущность ("habits",
+"stats", ...), второй — обычно id привычки. db.py сбрасывает записи
+по событиям из events.py, так что повторные открытия экранов не
+обращаются к диску, пока данные не изменились.
+"""
+from collections import OrderedDict
+import threading
+
+
+class LRUCache:
+    """Потокобезопасный LRU-кэш с ограниченным числом записей"""
+
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # Растёт при каждом сбросе: результат, прочитанный до сброса,
+        # не должен попасть в кэш после него (см. put)
+        self.generation = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def lookup(self, key):
+        """(True, значение) при попадании, (False, None) при промахе"""
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return True, self._data[key]
+            self.misses += 1
+            return False, None
+
+    def peek(self, key):
+        """Как lookup, но без учёта в счётчиках и порядке вытеснения"""
+        with self._lock:
+            if key in self._data:
+                return True, self._data[key]
+            return False, None
+
+    def put(self, key, value, generation=None):
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def invalidate(self, entity, habit_id=None):
+        """Удаляет записи сущности (для одной привычки, если указан habit_id)"""
+        with self._lock:
+            self.generation += 1
+            for key in [key for key in self._data
+                        if key[0] == entity and (habit_id is None or key[1] == habit_id)]:
+                del self._data[key]
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self._data),
+                "max_size": self.max_size,
+                "hit_rate": self.hits / total if total else 0.0,
+            }
@@ -1,167 +1,792 @@
+import csv
+import gzip
+import json
 import os
 import sqlite3
+from array import array
+import threading
+import time
+from contextlib import contextmanager
 from datetime import datetime, timedelta
+from itertools import groupby, islice
+
+import events
+import scheduler
+import streaks
+from cache import LRUCache
+from series import CompletionSeries
 
 DB_PATH = "habits.db"
 
+# Параметры SQLite, применяются к каждому подключению (см. configure())
+DB_SETTINGS = {
+    "synchronous": "NORMAL",         # OFF / NORMAL / FULL / EXTRA
+    "cache_size": -8000,             # отрицательное значение — размер в КиБ
+    "mmap_size": 32 * 1024 * 1024,   # байт, 0 — отключить mmap
+    "busy_timeout": 5000,            # мс ожидания блокировки
+}
+
+_SYNCHRONOUS_MODES = ("OFF", "NORMAL", "FULL", "EXTRA")
+
+# Одно подключение на запись (под блокировкой) и по подключению
+# на чтение в каждом потоке. Подключения живут до close_connections().
+_writer = None
+_write_lock = threading.RLock()
+_local = threading.local()
+_readers = []
+_readers_lock = threading.Lock()
+
 
 # ---------- ПОДКЛЮЧЕНИЕ ----------
-def get_connection():
-    """Создаёт подключение к SQLite, если базы нет — создаёт файл"""
-    try:
-        # если базы нет — создаём пустой файл
-        if not os.path.exists(DB_PATH):
-            open(DB_PATH, "w").close()
-            print(f"📁 Создан новый файл базы данных: {DB_PATH}")
+def _open_connection():
+    """Открывает подключение в режиме WAL с текущими DB_SETTINGS"""
+    created = not os.path.exists(DB_PATH)
+    if created:
+        print(f"📁 Создан новый файл базы данных: {DB_PATH}")
+
+    # check_same_thread=False: потоки не делят читателей, но закрываются
+    # все подключения из главного потока в close_connections()
+    conn = sqlite3.connect(DB_PATH, check_same_thread=False)
+    conn.row_factory = sqlite3.Row  # fetch возвращает dict-подобные строки
+    if created:
+        # Режим auto_vacuum задаётся до первой таблицы; потом его меняет
+        # только полный VACUUM (см. enable_incremental_vacuum)
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+    conn.execute("PRAGMA journal_mode=WAL")
+    # Каскадное удаление отметок/напоминаний вместе с привычкой
+    conn.execute("PRAGMA foreign_keys=ON")
+    _apply_pragmas(conn)
+    return conn
+
+
+def _apply_pragmas(conn):
+    synchronous = str(DB_SETTINGS["synchronous"]).upper()
+    if synchronous not in _SYNCHRONOUS_MODES:
+        raise ValueError(f"Недопустимый режим synchronous: {synchronous}")
+    conn.execute(f"PRAGMA synchronous={synchronous}")
+    conn.execute(f"PRAGMA cache_size={int(DB_SETTINGS['cache_size'])}")
+    conn.execute(f"PRAGMA mmap_size={int(DB_SETTINGS['mmap_size'])}")
+    conn.execute(f"PRAGMA busy_timeout={int(DB_SETTINGS['busy_timeout'])}")
+
+
+def configure(**settings):
+    """Меняет DB_SETTINGS и применяет их к уже открытым подключениям"""
+    unknown = set(settings) - set(DB_SETTINGS)
+    if unknown:
+        raise ValueError(f"Неизвестные настройки БД: {', '.join(sorted(unknown))}")
+    DB_SETTINGS.update(settings)
+
+    with _readers_lock:
+        connections = list(_readers)
+    with _write_lock:
+        if _writer is not None:
+            connections.append(_writer)
+        for conn in connections:
+            _apply_pragmas(conn)
+
 
-        conn = sqlite3.connect(DB_PATH)
-        conn.row_factory = sqlite3.Row  # fetch возвращает dict-подобные строки
+def get_connection():
+    """Подключение для чтения, своё для каждого потока. Закрывать не нужно"""
+    # Чтение видит собственные отложенные записи
+    if _pending:
+        flush()
+    conn = getattr(_local, "conn", None)
+    if conn is not None:
         return conn
+    try:
+        conn = _open_connection()
     except Exception as e:
         print(f"❌ Ошибка подключения к SQLite: {e}")
         return None
+    _local.conn = conn
+    with _readers_lock:
+        _readers.append(conn)
+    return conn
+
+
+@contextmanager
+def write_connection():
+    """Единственное подключение для записи, захваченное текущим потоком.
+
+    Внутри блока with запись сериализована; commit/rollback — на вызывающем.
+    """
+    global _writer
+    with _write_lock:
+        if _writer is None:
+            try:
+                _writer = _open_connection()
+            except Exception as e:
+                print(f"❌ Ошибка подключения к SQLite: {e}")
+        # Отложенные записи идут раньше любой другой записи
+        if _pending:
+            _drain(_writer)
+        yield _writer
+
+
+def close_connections():
+    """Закрывает все подключения (вызывается при остановке приложения)"""
+    global _writer, _local
+    flush()
+    with _write_lock:
+        if _writer is not None:
+            try:
+                _writer.close()
+            except Exception as e:
+                print(f"❌ Ошибка закрытия подключения: {e}")
+            _writer = None
+
+    with _readers_lock:
+        readers = list(_readers)
+        _readers.clear()
+    for conn in readers:
+        try:
+            conn.close()
+        except Exception as e:
+            print(f"❌ Ошибка закрытия подключения: {e}")
+    # Чужие потоки увидят закрытое подключение в _local, поэтому
+    # заводим новое хранилище — при следующем запросе откроется заново
+    _local = threading.local()
+    _cache.clear()
 
 
 # ---------- ИНИЦИАЛИЗАЦИЯ ----------
 def init_db():
-    conn = get_connection()
-    if conn is None:
-        print("❌ Не удалось подключиться к SQLite")
-        return False
+    with write_connection() as conn:
+        if conn is None:
+            print("❌ Не удалось подключиться к SQLite")
+            return False
 
-    cur = conn.cursor()
-    try:
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS habits (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            name TEXT NOT NULL,
-            goal TEXT,
-            repeat TEXT,
-            created_at TEXT DEFAULT (datetime('now'))
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS habits (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                name TEXT NOT NULL,
+                goal TEXT,
+                repeat TEXT,
+                created_at TEXT DEFAULT (datetime('now'))
+            )
+            """)
+
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS habit_logs (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                habit_id INTEGER REFERENCES habits(id) ON DELETE CASCADE,
+                date TEXT NOT NULL DEFAULT (date('now')),
+                created_at TEXT DEFAULT (datetime('now'))
+            )
+            """)
+
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS reminders (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                habit_id INTEGER UNIQUE REFERENCES habits(id) ON DELETE CASCADE,
+                time TEXT,
+                repeat TEXT,
+                days TEXT,
+                vibration INTEGER,
+                sound INTEGER,
+                text TEXT
+            )
+            """)
+
+            cur.execute("""
+            CREATE TABLE IF NOT EXISTS settings (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                dark_theme INTEGER,
+                primary_color TEXT
+            )
+            """)
+
+            conn.commit()
+            migrate(conn)
+            print("✅ SQLite инициализирована и готова к работе")
+            return True
+
+        except Exception as e:
+            print(f"❌ Ошибка при инициализации БД: {e}")
+            conn.rollback()
+            return False
+        finally:
+            cur.close()
+
+
+# ---------- МИГРАЦИИ ----------
+# Версия схемы хранится в PRAGMA user_version. Миграция N переводит
+# базу из версии N-1 в N; уже применённые миграции не запускаются.
+def _migration_1(cur):
+    # ORDER BY created_at в списке привычек
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_habits_created_at ON habits(created_at)")
+
+
+def _migration_2(cur):
+    # Убираем дубли отметок за один день, оставляя самую раннюю запись,
+    # после чего (habit_id, date) становится уникальным. Индекс заодно
+    # покрывает все запросы статистики по привычке.
+    cur.execute("""
+        DELETE FROM habit_logs
+        WHERE id NOT IN (SELECT MIN(id) FROM habit_logs GROUP BY habit_id, date)
+    """)
+    cur.execute("""
+        CREATE UNIQUE INDEX IF NOT EXISTS ux_habit_logs_habit_date
+        ON habit_logs(habit_id, date)
+    """)
+
+
+def _migration_3(cur):
+    # Материализованная сводка серий, чтобы не пересчитывать их из логов
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS habit_streaks (
+            habit_id INTEGER PRIMARY KEY REFERENCES habits(id) ON DELETE CASCADE,
+            current_streak INTEGER NOT NULL DEFAULT 0,
+            longest_streak INTEGER NOT NULL DEFAULT 0,
+            total INTEGER NOT NULL DEFAULT 0,
+            last_done TEXT,
+            first_done TEXT
         )
-        """)
+    """)
+    # Заполняется в _migration_5, когда у отметок появляется day
 
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS habit_logs (
+
+def _migration_4(cur):
+    # Журнал обслуживания базы (см. run_maintenance)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS maintenance_runs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
-            habit_id INTEGER REFERENCES habits(id) ON DELETE CASCADE,
-            date TEXT NOT NULL DEFAULT (date('now')),
-            created_at TEXT DEFAULT (datetime('now'))
+            finished_at TEXT DEFAULT (datetime('now')),
+            rows_deleted INTEGER NOT NULL DEFAULT 0,
+            bytes_reclaimed INTEGER NOT NULL DEFAULT 0
         )
-        """)
+    """)
 
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS reminders (
+
+def _migration_5(cur):
+    # Номер дня от 1970-01-01 (streaks.to_day) рядом с текстовой датой:
+    # выборки по диапазону — сравнение целых по индексу, а статистика
+    # получает номера дней без разбора строк
+    cur.execute("ALTER TABLE habit_logs ADD COLUMN day INTEGER")
+    cur.execute("UPDATE habit_logs SET day = CAST(julianday(date) - 2440587.5 AS INTEGER)")
+    cur.execute("""
+        CREATE INDEX IF NOT EXISTS idx_habit_logs_habit_day
+        ON habit_logs(habit_id, day)
+    """)
+    # Вставки, которые передают только date (старый код, date('now')
+    # по умолчанию), тоже получают day
+    cur.execute("""
+        CREATE TRIGGER IF NOT EXISTS trg_habit_logs_day
+        AFTER INSERT ON habit_logs WHEN NEW.day IS NULL
+        BEGIN
+            UPDATE habit_logs
+            SET day = CAST(julianday(NEW.date) - 2440587.5 AS INTEGER)
+            WHERE id = NEW.id;
+        END
+    """)
+    _rebuild_streaks(cur)
+
+
+def _migration_6(cur):
+    # Число отметок по неделям и месяцам для графиков за годы
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS habit_rollups (
+            habit_id INTEGER NOT NULL REFERENCES habits(id) ON DELETE CASCADE,
+            granularity TEXT NOT NULL,
+            period INTEGER NOT NULL,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (habit_id, granularity, period)
+        ) WITHOUT ROWID
+    """)
+    _rebuild_rollups(cur)
+
+
+def _migration_7(cur):
+    # Отметки всех привычек за период (общая тепловая карта)
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_habit_logs_day ON habit_logs(day)")
+
+
+def _migration_8(cur):
+    # Дни напоминания — битовая маска (понедельник — бит 0) вместо
+    # текста, и ближайшее срабатывание next_fire_at для выборки по
+    # индексу. У столбца TEXT число превратилось бы в строку, поэтому
+    # таблица пересоздаётся.
+    cur.execute("""
+        CREATE TABLE reminders_new (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             habit_id INTEGER UNIQUE REFERENCES habits(id) ON DELETE CASCADE,
             time TEXT,
             repeat TEXT,
-            days TEXT,
+            days INTEGER NOT NULL DEFAULT 0,
             vibration INTEGER,
             sound INTEGER,
-            text TEXT
+            text TEXT,
+            next_fire_at TEXT
         )
-        """)
+    """)
+    now = datetime.now()
+    # Напоминания удалённых привычек не переносятся: внешний ключ
+    # новой таблицы их не пропустит
+    cur.execute("""
+        SELECT id, habit_id, time, repeat, days, vibration, sound, text FROM reminders
+        WHERE habit_id IN (SELECT id FROM habits)
+    """)
+    rows = []
+    for row in cur.fetchall():
+        mask, next_fire_at = _reminder_schedule(row[2], row[3], row[4], now)
+        rows.append(tuple(row[:4]) + (mask,) + tuple(row[5:]) + (next_fire_at,))
+    cur.executemany("""
+        INSERT INTO reminders_new (id, habit_id, time, repeat, days, vibration, sound, text, next_fire_at)
+        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    cur.execute("DROP TABLE reminders")
+    cur.execute("ALTER TABLE reminders_new RENAME TO reminders")
+    cur.execute("CREATE INDEX IF NOT EXISTS idx_reminders_next_fire ON reminders(next_fire_at)")
 
-        cur.execute("""
-        CREATE TABLE IF NOT EXISTS settings (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            dark_theme INTEGER,
-            primary_color TEXT
-        )
-        """)
 
-        conn.commit()
-        print("✅ SQLite инициализирована и готова к работе")
-        return True
 
-    except Exception as e:
-        print(f"❌ Ошибка при инициализации БД: {e}")
-        conn.rollback()
-        return False
-    finally:
-        cur.close()
-        conn.close()
+def _migration_9(cur):
+    # Выключенное напоминание хранится, но не срабатывает (next_fire_at
+    # у него NULL). Прежде флаг не сохранялся, а сохранённые напоминания
+    # показывались включёнными — они и остаются включёнными.
+    cur.execute("ALTER TABLE reminders ADD COLUMN enabled INTEGER NOT NULL DEFAULT 1")
 
 
-# ---------- CRUD HABITS ----------
-def add_habit(name, goal=None, repeat=None):
-    conn = get_connection()
-    if conn is None:
-        return None
+MIGRATIONS = [
+    _migration_1,
+    _migration_2,
+    _migration_3,
+    _migration_4,
+    _migration_5,
+    _migration_6,
+    _migration_7,
+    _migration_8,
+    _migration_9,
+]
+
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def migrate(conn):
+    """Применяет недостающие миграции, каждую в своей транзакции"""
+    version = get_schema_version(conn)
+    for target in range(version + 1, len(MIGRATIONS) + 1):
+        cur = conn.cursor()
+        try:
+            cur.execute("BEGIN IMMEDIATE")
+            MIGRATIONS[target - 1](cur)
+            cur.execute(f"PRAGMA user_version={target}")
+            conn.commit()
+            print(f"🔧 Схема БД обновлена до версии {target}")
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+    return get_schema_version(conn)
+
+
+# ---------- КЭШ ----------
+# Результаты чтения кэшируются по ключам ("сущность", id, ...) и
+# сбрасываются по событиям записи (events.py). Значения из кэша общие
+# для всех вызывающих — их нельзя изменять.
+_cache = LRUCache(max_size=256)
+
+_INVALIDATES = {
+    events.HABIT_ADDED: ("habits", "dashboard", "habit", "summary"),
+    events.HABIT_UPDATED: ("habits", "dashboard", "habit", "summary", "stats"),
+    events.HABIT_DELETED: ("habits", "dashboard", "habit", "summary", "stats", "rollups",
+                           "reminder"),
+    events.LOG_ADDED: ("dashboard", "habit", "summary", "stats", "rollups"),
+    events.LOG_DELETED: ("dashboard", "habit", "summary", "stats", "rollups"),
+    events.STREAKS_REBUILT: ("dashboard", "habit", "summary", "stats", "rollups"),
+    events.REMINDER_SAVED: ("habit", "reminder"),
+    events.SETTINGS_SAVED: ("settings",),
+}
+# Сущности, которые хранятся одной записью на все привычки
+_CACHE_SHARED = ("habits", "dashboard", "settings")
+
+
+def _invalidate_cache(event):
+    for entity in _INVALIDATES.get(event.kind, ()):
+        if entity in _CACHE_SHARED or event.habit_id is None:
+            _cache.invalidate(entity)
+        else:
+            _cache.invalidate(entity, event.habit_id)
+
+
+events.subscribe(_invalidate_cache)
+
+
+def cache_stats():
+    """Счётчики попаданий/промахов кэша"""
+    return _cache.stats()
+
+
+def clear_cache():
+    _cache.clear()
+
+
+# ---------- ОЧЕРЕДЬ ЗАПИСИ ----------
+# Частые мелкие записи (отметки, настройки) не коммитятся по одной:
+# они копятся в очереди и записываются одной транзакцией — по таймеру,
+# перед любой другой записью, перед чтением (см. get_connection) и при
+# паузе/остановке приложения (flush()). Повторная запись с тем же
+# ключом заменяет предыдущую.
+#
+# DURABILITY:
+#   "batched"   — групповой commit не позже чем через FLUSH_INTERVAL;
+#                 при падении процесса теряются только эти секунды
+#   "immediate" — каждая запись сразу своим commit
+DURABILITY = "batched"
+FLUSH_INTERVAL = 0.5  # секунд
+
+_DURABILITY_MODES = ("batched", "immediate")
+
+_pending = {}        # ключ -> op(cur), возвращает список событий
+_pending_rows = {}   # habit_id -> сводка с учётом отложенных отметок
+_pending_lock = threading.Lock()
+_flush_timer = None
+
+
+def set_durability(mode):
+    """Меняет DURABILITY; накопленные записи сразу сохраняются"""
+    global DURABILITY
+    if mode not in _DURABILITY_MODES:
+        raise ValueError(f"Недопустимый режим записи: {mode}")
+    DURABILITY = mode
+    flush()
+
+
+def _enqueue(key, op, kind, habit_id=None, row=None):
+    """Ставит op в очередь; kind — событие, которое опубликует op.
+
+    Кэш этой привычки сбрасывается сразу, чтобы следующее чтение
+    прошло через базу (и сохранило очередь). Общая сводка главного
+    экрана остаётся, если передана row: get_dashboard() накладывает
+    на неё _pending_rows. Без row строка привычки неизвестна, и
+    сводка тоже сбрасывается.
+    """
+    global _flush_timer
+    with _pending_lock:
+        _pending[key] = op
+        if row is not None:
+            _pending_rows[habit_id] = row
+        else:
+            _pending_rows.pop(habit_id, None)
+        start_timer = _flush_timer is None and DURABILITY == "batched"
+        if start_timer:
+            _flush_timer = threading.Timer(FLUSH_INTERVAL, flush)
+            _flush_timer.daemon = True
+    for entity in _INVALIDATES.get(kind, ()):
+        if entity == "dashboard" and row is not None:
+            continue
+        if entity in _CACHE_SHARED or habit_id is None:
+            _cache.invalidate(entity)
+        else:
+            _cache.invalidate(entity, habit_id)
+    if DURABILITY != "batched":
+        flush()
+    elif start_timer:
+        _flush_timer.start()
+
+
+def _drain(conn):
+    """Записывает очередь одной транзакцией. Вызывается под _write_lock"""
+    global _flush_timer
+    with _pending_lock:
+        ops = list(_pending.values())
+        _pending.clear()
+        _pending_rows.clear()
+        if _flush_timer is not None:
+            _flush_timer.cancel()
+            _flush_timer = None
+    if not ops or conn is None:
+        return
+    published = []
     cur = conn.cursor()
     try:
-        cur.execute(
-            "INSERT INTO habits (name, goal, repeat) VALUES (?, ?, ?)",
-            (name, goal, repeat)
-        )
-        habit_id = cur.lastrowid
+        for op in ops:
+            published.extend(op(cur))
         conn.commit()
-        return habit_id
     except Exception as e:
-        print(f"❌ Ошибка добавления привычки: {e}")
+        print(f"❌ Ошибка групповой записи, сохраняем по одной: {e}")
         conn.rollback()
-        return None
+        # Одна ошибочная запись (например, отметка удалённой привычки)
+        # не должна терять остальные
+        published = []
+        for op in ops:
+            try:
+                published.extend(op(cur))
+                conn.commit()
+            except Exception as e:
+                print(f"❌ Ошибка отложенной записи: {e}")
+                conn.rollback()
     finally:
         cur.close()
-        conn.close()
+    for kind, habit_id in published:
+        events.publish(kind, habit_id)
+
+
+def flush():
+    """Сразу сохраняет отложенные записи (пауза/остановка приложения)"""
+    if not _pending:
+        return
+    with write_connection():
+        pass
+
+
+def pending_writes():
+    return len(_pending)
+
+
+# ---------- CRUD HABITS ----------
+def add_habit(name, goal=None, repeat=None):
+    with write_connection() as conn:
+        if conn is None:
+            return None
+        cur = conn.cursor()
+        try:
+            cur.execute(
+                "INSERT INTO habits (name, goal, repeat) VALUES (?, ?, ?)",
+                (name, goal, repeat)
+            )
+            habit_id = cur.lastrowid
+            conn.commit()
+            events.publish(events.HABIT_ADDED, habit_id)
+            return habit_id
+        except Exception as e:
+            print(f"❌ Ошибка добавления привычки: {e}")
+            conn.rollback()
+            return None
+        finally:
+            cur.close()
 
 
 def get_habits():
+    key = ("habits",)
+    hit, habits = _cache.lookup(key)
+    if hit:
+        return habits
+    generation = _cache.generation
     conn = get_connection()
     if conn is None:
         return []
     cur = conn.cursor()
     try:
         cur.execute("SELECT * FROM habits ORDER BY created_at DESC")
-        return [dict(row) for row in cur.fetchall()]
+        habits = [dict(row) for row in cur.fetchall()]
+        _cache.put(key, habits, generation)
+        return habits
     except Exception as e:
         print(f"❌ Ошибка получения привычек: {e}")
         return []
     finally:
         cur.close()
-        conn.close()
 
 
-def delete_habit(habit_id):
+HABIT_COLUMNS = ("id", "name", "goal", "repeat", "created_at")
+_REMINDER_COLUMNS = ("time", "repeat", "days", "vibration", "sound", "text", "enabled")
+
+
+def get_habit(habit_id, columns=None, with_stats=False, with_reminder=False):
+    """Одна привычка по первичному ключу.
+
+    columns — нужные столбцы habits (id возвращается всегда).
+    with_stats добавляет поля сводки как в get_dashboard(), with_reminder —
+    ключ "reminder" (словарь или None). Всё одним запросом.
+    """
+    columns = tuple(columns) if columns else HABIT_COLUMNS
+    unknown = set(columns) - set(HABIT_COLUMNS)
+    if unknown:
+        raise ValueError(f"Неизвестные столбцы habits: {', '.join(sorted(unknown))}")
+    if "id" not in columns:
+        columns = ("id",) + columns
+
+    today = datetime.today().strftime('%Y-%m-%d')
+    key = ("habit", habit_id, columns, with_stats, with_reminder, today)
+    hit, habit = _cache.lookup(key)
+    if hit:
+        return habit
+    generation = _cache.generation
+
+    select = [f"h.{column}" for column in columns]
+    joins = []
+    if with_stats:
+        select += ["h.repeat AS _repeat", "s.current_streak", "s.longest_streak",
+                   "s.total", "s.last_done"]
+        joins.append("LEFT JOIN habit_streaks s ON s.habit_id = h.id")
+    if with_reminder:
+        select += ["r.habit_id AS r_habit_id"] + [f"r.{column} AS r_{column}"
+                                                  for column in _REMINDER_COLUMNS]
+        joins.append("LEFT JOIN reminders r ON r.habit_id = h.id")
+
     conn = get_connection()
     if conn is None:
-        return
+        return None
     cur = conn.cursor()
     try:
-        cur.execute("DELETE FROM habits WHERE id=?", (habit_id,))
-        conn.commit()
+        cur.execute(
+            f"SELECT {', '.join(select)} FROM habits h {' '.join(joins)} WHERE h.id=?",
+            (habit_id,)
+        )
+        row = cur.fetchone()
+        if row is None:
+            habit = None
+        else:
+            habit = {column: row[column] for column in columns}
+            if with_stats:
+                summary = {"repeat": row["_repeat"], "current_streak": row["current_streak"],
+                           "last_done": row["last_done"]}
+                habit["total_done"] = row["total"] or 0
+                habit["done_today"] = row["last_done"] == today
+                habit["current_streak"] = _live_streak(summary)
+                habit["longest_streak"] = row["longest_streak"] or 0
+            if with_reminder:
+                habit["reminder"] = None if row["r_habit_id"] is None else dict(
+                    {column: row[f"r_{column}"] for column in _REMINDER_COLUMNS},
+                    habit_id=habit_id
+                )
+        _cache.put(key, habit, generation)
+        return habit
     except Exception as e:
-        print(f"❌ Ошибка удаления привычки: {e}")
-        conn.rollback()
+        print(f"❌ Ошибка получения привычки: {e}")
+        return None
     finally:
         cur.close()
-        conn.close()
+
+
+_UPDATABLE_COLUMNS = ("name", "goal", "repeat")
+
+
+def update_habit(habit_id, **fields):
+    """Меняет указанные поля привычки одним UPDATE.
+
+    id, отметки и напоминание сохраняются. Сводка серий пересчитывается,
+    только если изменилось расписание (repeat).
+    """
+    unknown = set(fields) - set(_UPDATABLE_COLUMNS)
+    if unknown:
+        raise ValueError(f"Нельзя изменить поля привычки: {', '.join(sorted(unknown))}")
+    if not fields:
+        return False
+
+    with write_connection() as conn:
+        if conn is None:
+            return False
+        cur = conn.cursor()
+        try:
+            old_schedule = _get_schedule(cur, habit_id) if "repeat" in fields else None
+            assignments = ", ".join(f"{column}=?" for column in fields)
+            cur.execute(
+                f"UPDATE habits SET {assignments} WHERE id=?",
+                (*fields.values(), habit_id)
+            )
+            updated = cur.rowcount > 0
+            if updated and old_schedule is not None \
+                    and streaks.Schedule.parse(fields["repeat"]) != old_schedule:
+                _rebuild_streaks(cur, habit_id)
+            conn.commit()
+            if updated:
+                events.publish(events.HABIT_UPDATED, habit_id)
+            return updated
+        except Exception as e:
+            print(f"❌ Ошибка обновления привычки: {e}")
+            conn.rollback()
+            return False
+        finally:
+            cur.close()
+
+
+def delete_habit(habit_id):
+    with write_connection() as conn:
+        if conn is None:
+            return
+        cur = conn.cursor()
+        try:
+            cur.execute("DELETE FROM habits WHERE id=?", (habit_id,))
+            cur.execute("DELETE FROM habit_streaks WHERE habit_id=?", (habit_id,))
+            cur.execute("DELETE FROM habit_rollups WHERE habit_id=?", (habit_id,))
+            conn.commit()
+            events.publish(events.HABIT_DELETED, habit_id)
+        except Exception as e:
+            print(f"❌ Ошибка удаления привычки: {e}")
+            conn.rollback()
+        finally:
+            cur.close()
 
 
 # ---------- CRUD HABIT LOGS ----------
 def log_habit_done(habit_id, date=None):
+    """Отмечает выполнение; возвращает id отметки, None — ошибка.
+
+    В режиме DURABILITY="batched" отметка ставится в очередь записи
+    (см. flush()) и возвращается True.
+    """
     if date is None:
         date = datetime.today().strftime('%Y-%m-%d')
-    conn = get_connection()
-    if conn is None:
-        return None
-    cur = conn.cursor()
-    try:
-        cur.execute(
-            "INSERT INTO habit_logs (habit_id, date) VALUES (?, ?)",
-            (habit_id, date)
-        )
+    if DURABILITY == "batched":
+        _enqueue(("log", habit_id, date),
+                 lambda cur: _insert_log(cur, habit_id, date)[1],
+                 events.LOG_ADDED, habit_id)
+        return True
+    with write_connection() as conn:
+        if conn is None:
+            return None
+        cur = conn.cursor()
+        try:
+            log_id, published = _insert_log(cur, habit_id, date)
+            conn.commit()
+            for kind, event_habit_id in published:
+                events.publish(kind, event_habit_id)
+            return log_id
+        except Exception as e:
+            print(f"❌ Ошибка отметки привычки: {e}")
+            conn.rollback()
+            return None
+        finally:
+            cur.close()
+
+
+def _insert_log(cur, habit_id, date):
+    """Вставка отметки без commit: (id, события для публикации)"""
+    # Повторная отметка за тот же день ничего не добавляет
+    cur.execute("""
+        INSERT INTO habit_logs (habit_id, date, day) VALUES (?, ?, ?)
+        ON CONFLICT(habit_id, date) DO NOTHING
+    """, (habit_id, date, streaks.to_day(date)))
+    if cur.rowcount > 0:
         log_id = cur.lastrowid
-        conn.commit()
-        return log_id
-    except Exception as e:
-        print(f"❌ Ошибка отметки привычки: {e}")
-        conn.rollback()
-        return None
-    finally:
-        cur.close()
-        conn.close()
+        _streak_after_insert(cur, habit_id, date)
+        _rollup_add(cur, habit_id, streaks.to_day(date), 1)
+        return log_id, [(events.LOG_ADDED, habit_id)]
+    cur.execute(
+        "SELECT id FROM habit_logs WHERE habit_id=? AND date=?",
+        (habit_id, date)
+    )
+    return cur.fetchone()[0], []
+
+
+def delete_habit_log(habit_id, date):
+    with write_connection() as conn:
+        if conn is None:
+            return False
+        cur = conn.cursor()
+        try:
+            cur.execute("DELETE FROM habit_logs WHERE habit_id=? AND date=?", (habit_id, date))
+            deleted = cur.rowcount > 0
+            if deleted:
+                _streak_after_delete(cur, habit_id, date)
+                _rollup_add(cur, habit_id, streaks.to_day(date), -1)
+            conn.commit()
+            if deleted:
+                events.publish(events.LOG_DELETED, habit_id)
+            return deleted
+        except Exception as e:
+            print(f"❌ Ошибка удаления отметки: {e}")
+            conn.rollback()
+            return False
+        finally:
+            cur.close()
 
 
 def get_habit_logs(habit_id):
@@ -170,40 +795,50 @@ def get_habit_logs(habit_id):
         return []
     cur = conn.cursor()
     try:
-        cur.execute("SELECT * FROM habit_logs WHERE habit_id=? ORDER BY date DESC", (habit_id,))
+        cur.execute("SELECT * FROM habit_logs WHERE habit_id=? ORDER BY day DESC", (habit_id,))
         return [dict(row) for row in cur.fetchall()]
     except Exception as e:
         print(f"❌ Ошибка получения логов: {e}")
         return []
     finally:
         cur.close()
-        conn.close()
 
 
 # ---------- СТАТИСТИКА ----------
 def get_habit_stats(habit_id):
+    # Текущая серия зависит от даты, поэтому она входит в ключ
+    key = ("stats", habit_id, datetime.today().strftime('%Y-%m-%d'))
+    hit, stats = _cache.lookup(key)
+    if hit:
+        return stats
+    generation = _cache.generation
     conn = get_connection()
     if conn is None:
         return empty_stats()
     cur = conn.cursor()
     try:
-        cur.execute("SELECT date FROM habit_logs WHERE habit_id=? ORDER BY date", (habit_id,))
-        completions = [row[0] for row in cur.fetchall()]
+        cur.execute("""
+            SELECT h.repeat, s.*
+            FROM habits h
+            LEFT JOIN habit_streaks s ON s.habit_id = h.id
+            WHERE h.id=?
+        """, (habit_id,))
+        summary = cur.fetchone()
 
+        # Отметки по дням экран читает сам: историю — постранично
+        # (get_history_page), график и карту — по периодам
         stats = {
-            "total_done": len(completions),
-            "current_streak": calculate_current_streak(completions),
-            "longest_streak": calculate_longest_streak(completions),
-            "completions": completions,
-            "last_30_days": get_last_30_days_completions(habit_id)
+            "total_done": summary["total"] or 0 if summary else 0,
+            "current_streak": _live_streak(summary),
+            "longest_streak": summary["longest_streak"] or 0 if summary else 0,
         }
+        _cache.put(key, stats, generation)
         return stats
     except Exception as e:
         print(f"❌ Ошибка получения статистики: {e}")
         return empty_stats()
     finally:
         cur.close()
-        conn.close()
 
 
 def empty_stats():
@@ -211,83 +846,641 @@ def empty_stats():
         "total_done": 0,
         "current_streak": 0,
         "longest_streak": 0,
-        "completions": [],
-        "last_30_days": []
     }
 
 
-def calculate_current_streak(completions):
-    if not completions:
-        return 0
-    today = datetime.now().date()
-    streak = 0
-    for i in range(30):
-        check_date = today - timedelta(days=i)
-        if check_date.strftime("%Y-%m-%d") in completions:
-            streak += 1
-        else:
-            break
-    return streak
+def _as_day(value):
+    return value if isinstance(value, int) else streaks.to_day(value)
 
 
-def calculate_longest_streak(completions):
-    if not completions:
-        return 0
-    dates = sorted(datetime.strptime(d, "%Y-%m-%d").date() for d in completions)
-    longest, current = 1, 1
-    for i in range(1, len(dates)):
-        if (dates[i] - dates[i - 1]).days == 1:
-            current += 1
-            longest = max(longest, current)
+def get_completions(habit_id, start=None, end=None):
+    """Отметки привычки с start по end включительно (номер дня, date
+    или 'YYYY-MM-DD') — CompletionSeries номеров дней"""
+    conn = get_connection()
+    if conn is None:
+        return CompletionSeries()
+    cur = conn.cursor()
+    try:
+        cur.execute(
+            "SELECT day FROM habit_logs WHERE habit_id=? AND day BETWEEN ? AND ? ORDER BY day",
+            (habit_id,
+             -2 ** 31 if start is None else _as_day(start),
+             2 ** 31 - 1 if end is None else _as_day(end)),
+        )
+        return CompletionSeries([row[0] for row in cur.fetchall()], presorted=True)
+    except Exception as e:
+        print(f"❌ Ошибка получения выполнений: {e}")
+        return CompletionSeries()
+    finally:
+        cur.close()
+
+
+def get_completion_days(start, end=None, habit_id=None):
+    """Номера дней всех отметок с start по end (одной привычки или всех).
+
+    Повторы не убираются: для общей карты день с тремя отметками — три
+    элемента. Возвращает array('i').
+    """
+    conn = get_connection()
+    if conn is None:
+        return array("i")
+    cur = conn.cursor()
+    try:
+        end = 2 ** 31 - 1 if end is None else _as_day(end)
+        if habit_id is None:
+            cur.execute("SELECT day FROM habit_logs WHERE day BETWEEN ? AND ?",
+                        (_as_day(start), end))
         else:
-            current = 1
-    return longest
+            cur.execute("SELECT day FROM habit_logs WHERE habit_id=? AND day BETWEEN ? AND ?",
+                        (habit_id, _as_day(start), end))
+        return array("i", (row[0] for row in cur))
+    except Exception as e:
+        print(f"❌ Ошибка получения отметок: {e}")
+        return array("i")
+    finally:
+        cur.close()
 
 
-def get_last_30_days_completions(habit_id):
+def get_history_page(habit_id, before_date=None, limit=20):
+    """Страница истории: до limit отметок раньше before_date, новые первыми.
+
+    Постраничный переход по ключу: следующая страница начинается с
+    последней даты предыдущей, поэтому каждая страница — один проход
+    по индексу (habit_id, day) независимо от длины истории.
+    Возвращает список date.
+    """
     conn = get_connection()
     if conn is None:
         return []
     cur = conn.cursor()
     try:
-        thirty_days_ago = (datetime.now() - timedelta(days=30)).strftime("%Y-%m-%d")
         cur.execute(
-            "SELECT date FROM habit_logs WHERE habit_id=? AND date >= ? ORDER BY date",
-            (habit_id, thirty_days_ago),
+            "SELECT day FROM habit_logs WHERE habit_id=? AND day < ? ORDER BY day DESC LIMIT ?",
+            (habit_id, 2 ** 31 - 1 if before_date is None else _as_day(before_date), limit)
         )
-        return [row[0] for row in cur.fetchall()]
+        return [streaks.from_day(row[0]) for row in cur.fetchall()]
     except Exception as e:
-        print(f"❌ Ошибка получения выполнений за 30 дней: {e}")
+        print(f"❌ Ошибка получения истории: {e}")
         return []
     finally:
         cur.close()
-        conn.close()
 
 
-# ---------- CRUD REMINDERS ----------
-def save_reminder(habit_id, time, repeat, days, vibration, sound, text):
+def get_last_30_days_completions(habit_id):
+    return get_completions(habit_id, streaks.today_day() - 30)
+
+
+_DASHBOARD_SQL = """
+    SELECT h.*, s.current_streak, s.longest_streak, s.total, s.last_done
+    FROM habits h
+    LEFT JOIN habit_streaks s ON s.habit_id = h.id
+"""
+
+
+def _dashboard_row(row, today):
+    habit = dict(row)
+    summary = {key: habit.pop(key) for key in
+               ("current_streak", "longest_streak", "total", "last_done")}
+    habit["total_done"] = summary["total"] or 0
+    habit["done_today"] = summary["last_done"] == today
+    summary["repeat"] = habit["repeat"]
+    habit["current_streak"] = _live_streak(summary)
+    habit["longest_streak"] = summary["longest_streak"] or 0
+    habit["last_done"] = summary["last_done"]
+    return habit
+
+
+def get_dashboard():
+    """Все привычки со сводной статистикой для главного экрана.
+
+    Один запрос к habits и сводке habit_streaks: стоимость зависит
+    только от числа привычек, а не от истории отметок.
+    """
+    today = datetime.today().strftime('%Y-%m-%d')
+    key = ("dashboard", today)
+    hit, habits = _cache.lookup(key)
+    if hit:
+        return _with_pending(habits)
+    generation = _cache.generation
+    conn = get_connection()
+    if conn is None:
+        return []
+    cur = conn.cursor()
+    try:
+        cur.execute(_DASHBOARD_SQL + " ORDER BY h.created_at DESC")
+        habits = [_dashboard_row(row, today) for row in cur.fetchall()]
+        _cache.put(key, habits, generation)
+        return habits
+    except Exception as e:
+        print(f"❌ Ошибка получения сводки привычек: {e}")
+        return []
+    finally:
+        cur.close()
+
+
+def _with_pending(habits):
+    # Сводка из кэша не сбрасывается при отложенной отметке — строки
+    # таких привычек берутся из _pending_rows
+    with _pending_lock:
+        rows = dict(_pending_rows)
+    if not rows:
+        return habits
+    return [rows.get(habit["id"], habit) for habit in habits]
+
+
+def get_habit_summary(habit_id):
+    """Строка get_dashboard() для одной привычки"""
+    today = datetime.today().strftime('%Y-%m-%d')
+    key = ("summary", habit_id, today)
+    hit, habit = _cache.lookup(key)
+    if hit:
+        return habit
+    generation = _cache.generation
     conn = get_connection()
     if conn is None:
         return None
     cur = conn.cursor()
     try:
-        cur.execute("""
-            INSERT OR REPLACE INTO reminders (habit_id, time, repeat, days, vibration, sound, text)
-            VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (habit_id, time, repeat, days, vibration, sound, text))
-        reminder_id = cur.lastrowid
-        conn.commit()
-        return reminder_id
+        cur.execute(_DASHBOARD_SQL + " WHERE h.id=?", (habit_id,))
+        row = cur.fetchone()
+        habit = _dashboard_row(row, today) if row else None
+        _cache.put(key, habit, generation)
+        return habit
     except Exception as e:
-        print(f"❌ Ошибка сохранения напоминания: {e}")
-        conn.rollback()
+        print(f"❌ Ошибка получения сводки привычки: {e}")
         return None
     finally:
         cur.close()
-        conn.close()
+
+
+def check_in(habit_id, date=None):
+    """Отмечает выполнение и возвращает обновлённую сводку этой привычки.
+
+    Если сводка уже известна (кэш главного экрана или предыдущая
+    отложенная отметка), отметка за сегодня считается в памяти, а
+    запись уходит в очередь — серия отметок не читает базу и
+    коммитится один раз.
+    """
+    today = datetime.today().strftime('%Y-%m-%d')
+    if date is None:
+        date = today
+    # В сводке current_streak — живая серия (_live_streak): для
+    # прерванной серии там 0, а не её длина. Продолжить по ней можно
+    # только сегодняшней отметкой; остальные даты считает база.
+    known = _known_summary(habit_id) if DURABILITY == "batched" and date == today else None
+    if known is None or (known["last_done"] or "") > date:
+        if log_habit_done(habit_id, date) is None:
+            return None
+        flush()
+        return get_habit_summary(habit_id)
+
+    habit = dict(known)
+    if known["last_done"] != date:
+        schedule = streaks.Schedule.parse(known["repeat"])
+        last_day = streaks.to_day(known["last_done"]) if known["last_done"] else None
+        habit["current_streak"] = streaks.advance(
+            known["current_streak"], last_day, streaks.to_day(date), schedule)
+        habit["longest_streak"] = max(known["longest_streak"], habit["current_streak"])
+        habit["total_done"] = known["total_done"] + 1
+        habit["last_done"] = date
+        habit["done_today"] = True
+    _enqueue(("log", habit_id, date),
+             lambda cur: _insert_log(cur, habit_id, date)[1],
+             events.LOG_ADDED, habit_id, row=habit)
+    return habit
+
+
+def _known_summary(habit_id):
+    """Сводка привычки без обращения к базе или None"""
+    with _pending_lock:
+        habit = _pending_rows.get(habit_id)
+    if habit is not None:
+        return habit
+    today = datetime.today().strftime('%Y-%m-%d')
+    hit, habit = _cache.peek(("summary", habit_id, today))
+    if hit:
+        return habit
+    hit, habits = _cache.peek(("dashboard", today))
+    for habit in habits if hit else ():
+        if habit["id"] == habit_id:
+            return habit
+    return None
+
+
+# ---------- СВОДКА СЕРИЙ ----------
+# habit_streaks хранит по строке на привычку: current_streak — длина
+# серии (в периодах расписания, см. streaks.Schedule), которая
+# заканчивается на last_done. Текущей она считается, пока серия не
+# прервана (см. _live_streak).
+def _get_schedule(cur, habit_id):
+    cur.execute("SELECT repeat FROM habits WHERE id=?", (habit_id,))
+    row = cur.fetchone()
+    return streaks.Schedule.parse(row[0] if row else None)
+
+
+def _live_streak(summary):
+    """Текущая серия по строке сводки (нужны repeat, last_done, current_streak)"""
+    if not summary or not summary["last_done"]:
+        return 0
+    schedule = streaks.Schedule.parse(summary["repeat"])
+    if not streaks.is_alive(streaks.to_day(summary["last_done"]), schedule):
+        return 0
+    return summary["current_streak"]
+
+
+def _count_periods(cur, habit_id, start, step, schedule, expected, skip=None):
+    """Сколько периодов подряд (expected, expected + step, ...) отмечено,
+    если идти от дня start в сторону step (±1).
+
+    Курсор идёт по индексу (habit_id, day) и останавливается на первом
+    пропуске, поэтому читается только сама серия. Строки периода skip
+    пропускаются; второе значение — встретился ли он.
+    """
+    if step < 0:
+        cur.execute(
+            "SELECT day FROM habit_logs WHERE habit_id=? AND day<=? ORDER BY day DESC",
+            (habit_id, start)
+        )
+    else:
+        cur.execute(
+            "SELECT day FROM habit_logs WHERE habit_id=? AND day>=? ORDER BY day",
+            (habit_id, start)
+        )
+    count = 0
+    seen_skip = False
+    previous = None
+    for (day,) in cur:
+        period = schedule.period(day)
+        if period == skip:
+            seen_skip = True
+            continue
+        if period == previous:
+            continue
+        if period != expected:
+            break
+        count += 1
+        previous = period
+        expected += step
+    return count, seen_skip
+
+
+def _run_around(cur, habit_id, day, schedule):
+    """Периоды подряд до и после периода дня day (сам период не считается)"""
+    period = schedule.period(day)
+    before, seen_before = _count_periods(cur, habit_id, day - 1, -1, schedule,
+                                         period - 1, skip=period)
+    after, seen_after = _count_periods(cur, habit_id, day + 1, 1, schedule,
+                                       period + 1, skip=period)
+    return before, after, seen_before or seen_after
+
+
+def _streak_after_insert(cur, habit_id, date):
+    cur.execute("SELECT * FROM habit_streaks WHERE habit_id=?", (habit_id,))
+    summary = cur.fetchone()
+    if summary is None or not summary["last_done"]:
+        cur.execute("""
+            INSERT OR REPLACE INTO habit_streaks
+                (habit_id, current_streak, longest_streak, total, last_done, first_done)
+            VALUES (?, 1, 1, 1, ?, ?)
+        """, (habit_id, date, date))
+        return
+
+    schedule = _get_schedule(cur, habit_id)
+    day = streaks.to_day(date)
+    last_day = streaks.to_day(summary["last_done"])
+    current = summary["current_streak"]
+    longest = summary["longest_streak"]
+
+    if day > last_day:
+        # Обычная отметка: продолжаем серию или начинаем новую
+        current = streaks.advance(current, last_day, day, schedule)
+        longest = max(longest, current)
+        last_day = day
+    else:
+        # Отметка задним числом: могла склеить две серии
+        before, after, _ = _run_around(cur, habit_id, day, schedule)
+        run = before + 1 + after
+        longest = max(longest, run)
+        if schedule.period(day) + after == schedule.period(last_day):
+            current = run
+
+    cur.execute("""
+        UPDATE habit_streaks
+        SET current_streak=?, longest_streak=?, total=total + 1,
+            last_done=?, first_done=MIN(first_done, ?)
+        WHERE habit_id=?
+    """, (current, longest, streaks.from_day(last_day).isoformat(), date, habit_id))
+
+
+def _streak_after_delete(cur, habit_id, date):
+    cur.execute("SELECT * FROM habit_streaks WHERE habit_id=?", (habit_id,))
+    summary = cur.fetchone()
+    if summary is None or summary["total"] <= 1:
+        cur.execute("DELETE FROM habit_streaks WHERE habit_id=?", (habit_id,))
+        return
+
+    schedule = _get_schedule(cur, habit_id)
+    day = streaks.to_day(date)
+    before, after, period_kept = _run_around(cur, habit_id, day, schedule)
+    current = summary["current_streak"]
+    if not period_kept:
+        if before + 1 + after >= summary["longest_streak"]:
+            # Удалённый день мог разбить самую длинную серию — пересчитываем
+            # привычку целиком (редкий случай)
+            _rebuild_streaks(cur, habit_id)
+            return
+        if schedule.period(day) + after == schedule.period(streaks.to_day(summary["last_done"])):
+            current = after
+
+    last_done = summary["last_done"]
+    first_done = summary["first_done"]
+    if date == last_done:
+        cur.execute("SELECT MAX(day) FROM habit_logs WHERE habit_id=?", (habit_id,))
+        last_day = cur.fetchone()[0]
+        last_done = streaks.from_day(last_day).isoformat()
+        if not period_kept:
+            current, _ = _count_periods(cur, habit_id, last_day, -1, schedule,
+                                        schedule.period(last_day))
+    if date == first_done:
+        cur.execute("SELECT MIN(day) FROM habit_logs WHERE habit_id=?", (habit_id,))
+        first_done = streaks.from_day(cur.fetchone()[0]).isoformat()
+
+    cur.execute("""
+        UPDATE habit_streaks
+        SET current_streak=?, total=total - 1, last_done=?, first_done=?
+        WHERE habit_id=?
+    """, (current, last_done, first_done, habit_id))
+
+
+def _rebuild_streaks(cur, habit_id=None):
+    """Пересчитывает habit_streaks из habit_logs (для всех или одной привычки)"""
+    if habit_id is None:
+        cur.execute("DELETE FROM habit_streaks")
+        cur.execute("""
+            SELECT l.habit_id, h.repeat, l.day
+            FROM habit_logs l
+            JOIN habits h ON h.id = l.habit_id
+            ORDER BY l.habit_id, l.day
+        """)
+    else:
+        cur.execute("DELETE FROM habit_streaks WHERE habit_id=?", (habit_id,))
+        cur.execute("""
+            SELECT l.habit_id, h.repeat, l.day
+            FROM habit_logs l
+            JOIN habits h ON h.id = l.habit_id
+            WHERE l.habit_id=?
+            ORDER BY l.day
+        """, (habit_id,))
+
+    rows = []
+    for (habit, repeat), logs in groupby(cur.fetchall(), key=lambda row: (row[0], row[1])):
+        days = [row[2] for row in logs]
+        summary = streaks.summarize(days, streaks.Schedule.parse(repeat))
+        rows.append((habit, summary["current_streak"], summary["longest_streak"],
+                     summary["total"], summary["last_done"], summary["first_done"]))
+    cur.executemany("""
+        INSERT INTO habit_streaks
+            (habit_id, current_streak, longest_streak, total, last_done, first_done)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """, rows)
+
+
+def rebuild_streaks(habit_id=None):
+    with write_connection() as conn:
+        if conn is None:
+            return False
+        cur = conn.cursor()
+        try:
+            _rebuild_streaks(cur, habit_id)
+            conn.commit()
+            events.publish(events.STREAKS_REBUILT, habit_id)
+            print("✅ Сводка серий пересчитана")
+            return True
+        except Exception as e:
+            print(f"❌ Ошибка пересчёта серий: {e}")
+            conn.rollback()
+            return False
+        finally:
+            cur.close()
+
+
+# ---------- ИТОГИ ПО ПЕРИОДАМ ----------
+# habit_rollups: число отметок привычки за неделю (period —
+# streaks.week_index) и за месяц (streaks.month_index). Обновляется
+# вместе с каждой отметкой; графики за годы читают десятки строк
+# вместо всей истории.
+ROLLUP_GRANULARITIES = ("week", "month")
+
+_ROLLUP_PERIOD = {"week": streaks.week_index, "month": streaks.month_index}
+_ROLLUP_START = {"week": streaks.week_start, "month": streaks.month_start}
+
+
+def _rollup_add(cur, habit_id, day, delta):
+    cur.executemany("""
+        INSERT INTO habit_rollups (habit_id, granularity, period, count)
+        VALUES (?, ?, ?, ?)
+        ON CONFLICT(habit_id, granularity, period) DO UPDATE SET count = count + excluded.count
+    """, [(habit_id, granularity, period(day), delta)
+          for granularity, period in _ROLLUP_PERIOD.items()])
+    if delta < 0:
+        cur.execute("DELETE FROM habit_rollups WHERE habit_id=? AND count <= 0", (habit_id,))
+
+
+def _rebuild_rollups(cur, habit_id=None):
+    """Пересчитывает habit_rollups из habit_logs (для всех или одной привычки)"""
+    if habit_id is None:
+        cur.execute("DELETE FROM habit_rollups")
+        # Отметки удалённых привычек (до foreign_keys) не переносятся:
+        # ссылка на несуществующую привычку нарушила бы внешний ключ
+        cur.execute("""
+            SELECT l.habit_id, l.day
+            FROM habit_logs l
+            JOIN habits h ON h.id = l.habit_id
+            ORDER BY l.habit_id, l.day
+        """)
+    else:
+        cur.execute("DELETE FROM habit_rollups WHERE habit_id=?", (habit_id,))
+        cur.execute("""
+            SELECT l.habit_id, l.day
+            FROM habit_logs l
+            JOIN habits h ON h.id = l.habit_id
+            WHERE l.habit_id=?
+            ORDER BY l.day
+        """, (habit_id,))
+
+    rows = []
+    for habit, logs in groupby(cur.fetchall(), key=lambda row: row[0]):
+        days = [row[1] for row in logs]
+        for granularity, period in _ROLLUP_PERIOD.items():
+            rows.extend((habit, granularity, key, sum(1 for _ in group))
+                        for key, group in groupby(days, key=period))
+    cur.executemany("""
+        INSERT INTO habit_rollups (habit_id, granularity, period, count)
+        VALUES (?, ?, ?, ?)
+    """, rows)
+
+
+def rebuild_rollups(habit_id=None):
+    with write_connection() as conn:
+        if conn is None:
+            return False
+        cur = conn.cursor()
+        try:
+            _rebuild_rollups(cur, habit_id)
+            conn.commit()
+            # Для экранов это то же, что пересчёт серий: производная
+            # статистика поменялась целиком
+            events.publish(events.STREAKS_REBUILT, habit_id)
+            print("✅ Итоги по периодам пересчитаны")
+            return True
+        except Exception as e:
+            print(f"❌ Ошибка пересчёта итогов: {e}")
+            conn.rollback()
+            return False
+        finally:
+            cur.close()
+
+
+def get_rollups(habit_id, granularity, start=None, end=None):
+    """Отметки привычки по неделям или месяцам.
+
+    granularity — "week" или "month"; start/end — номер дня, date или
+    'YYYY-MM-DD' (берутся периоды, в которые они попадают). Возвращает
+    список (первый день периода как date, число отметок) по возрастанию;
+    периоды без отметок пропускаются.
+    """
+    if granularity not in _ROLLUP_PERIOD:
+        raise ValueError(f"Недопустимая гранулярность: {granularity}")
+    period = _ROLLUP_PERIOD[granularity]
+    first = None if start is None else period(_as_day(start))
+    last = None if end is None else period(_as_day(end))
+
+    key = ("rollups", habit_id, granularity, first, last)
+    hit, rollups = _cache.lookup(key)
+    if hit:
+        return rollups
+    generation = _cache.generation
+    conn = get_connection()
+    if conn is None:
+        return []
+    cur = conn.cursor()
+    try:
+        cur.execute("""
+            SELECT period, count FROM habit_rollups
+            WHERE habit_id=? AND granularity=? AND period BETWEEN ? AND ?
+            ORDER BY period
+        """, (habit_id, granularity,
+              -2 ** 31 if first is None else first,
+              2 ** 31 - 1 if last is None else last))
+        period_start = _ROLLUP_START[granularity]
+        rollups = [(streaks.from_day(period_start(row[0])), row[1]) for row in cur.fetchall()]
+        _cache.put(key, rollups, generation)
+        return rollups
+    except Exception as e:
+        print(f"❌ Ошибка получения итогов по периодам: {e}")
+        return []
+    finally:
+        cur.close()
+
+
+CHART_SERIES = ("count", "rate")
+
+
+def get_chart_series(habit_id, days=30, series="count"):
+    """Точки графика за последние days дней: [(первый день точки как date, значение)].
+
+    До 30 дней — точка на день, до 90 — на неделю, дальше — на месяц
+    (недели и месяцы берутся из habit_rollups). series: "count" — число
+    отметок, "rate" — доля выполненных периодов расписания (0..1).
+    """
+    if series not in CHART_SERIES:
+        raise ValueError(f"Недопустимый ряд графика: {series}")
+    today = streaks.today_day()
+    start = today - days + 1
+    habit = get_habit(habit_id, columns=("repeat",))
+    schedule = streaks.Schedule.parse(habit["repeat"] if habit else None)
+
+    points = []  # (первый день, последний день, число отметок)
+    if days <= 30:
+        done = get_completions(habit_id, start, today)
+        points = [(day, day, int(done.contains(day))) for day in range(start, today + 1)]
+    else:
+        granularity = "week" if days <= 90 else "month"
+        period = _ROLLUP_PERIOD[granularity]
+        period_start = _ROLLUP_START[granularity]
+        counts = {streaks.to_day(first): count
+                  for first, count in get_rollups(habit_id, granularity, start, today)}
+        for index in range(period(start), period(today) + 1):
+            first = period_start(index)
+            points.append((first, min(period_start(index + 1) - 1, today), counts.get(first, 0)))
+
+    if series == "rate":
+        return [(streaks.from_day(first),
+                 min(count / (schedule.period(last) - schedule.period(first) + 1), 1.0))
+                for first, last, count in points]
+    return [(streaks.from_day(first), count) for first, _, count in points]
+
+
+# ---------- CRUD REMINDERS ----------
+# reminders.days — маска дней недели (понедельник — бит 0, см.
+# scheduler.weekday_mask), next_fire_at — ближайшее срабатывание
+# 'YYYY-MM-DD HH:MM' по местному времени (NULL — не срабатывает).
+_FIRE_FORMAT = '%Y-%m-%d %H:%M'
+
+
+def _reminder_days(repeat, days):
+    """Маска дней из любого прежнего вида: список, JSON-строка, число"""
+    if isinstance(days, str):
+        days = days.strip()
+        if days.isdigit():
+            days = int(days)
+        elif days.startswith("["):
+            try:
+                days = json.loads(days)
+            except ValueError:
+                days = []
+    return scheduler.weekday_mask(repeat, days) & streaks.ALL_DAYS
+
+
+def _reminder_schedule(time, repeat, days, now=None, enabled=True):
+    """(маска дней, next_fire_at) для записи в reminders"""
+    mask = _reminder_days(repeat, days)
+    fire_at = scheduler.next_fire(time, mask, now or datetime.now()) if enabled else None
+    return mask, fire_at.strftime(_FIRE_FORMAT) if fire_at else None
+
+
+def save_reminder(habit_id, time, repeat, days, vibration, sound, text, enabled=True):
+    """days — список названий дней ('Mon', ...) или маска"""
+    mask, next_fire_at = _reminder_schedule(time, repeat, days, enabled=enabled)
+    with write_connection() as conn:
+        if conn is None:
+            return None
+        cur = conn.cursor()
+        try:
+            cur.execute("""
+                INSERT OR REPLACE INTO reminders
+                    (habit_id, time, repeat, days, vibration, sound, text, enabled, next_fire_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+            """, (habit_id, time, repeat, mask, vibration, sound, text, int(bool(enabled)),
+                  next_fire_at))
+            reminder_id = cur.lastrowid
+            conn.commit()
+            events.publish(events.REMINDER_SAVED, habit_id)
+            return reminder_id
+        except Exception as e:
+            print(f"❌ Ошибка сохранения напоминания: {e}")
+            conn.rollback()
+            return None
+        finally:
+            cur.close()
 
 
 def get_reminder(habit_id):
+    key = ("reminder", habit_id)
+    hit, reminder = _cache.lookup(key)
+    if hit:
+        return reminder
+    generation = _cache.generation
     conn = get_connection()
     if conn is None:
         return None
@@ -295,36 +1488,114 @@ def get_reminder(habit_id):
     try:
         cur.execute("SELECT * FROM reminders WHERE habit_id=?", (habit_id,))
         row = cur.fetchone()
-        return dict(row) if row else None
+        reminder = dict(row) if row else None
+        _cache.put(key, reminder, generation)
+        return reminder
     except Exception as e:
         print(f"❌ Ошибка получения напоминания: {e}")
         return None
     finally:
         cur.close()
-        conn.close()
 
 
-# ---------- CRUD SETTINGS ----------
-def save_settings(dark_theme, primary_color):
+
+def get_reminders():
+    """Все напоминания (для планировщика при запуске)"""
     conn = get_connection()
     if conn is None:
-        return
+        return []
     cur = conn.cursor()
     try:
-        cur.execute("""
-            INSERT OR REPLACE INTO settings (id, dark_theme, primary_color)
-            VALUES (1, ?, ?)
-        """, (dark_theme, primary_color))
-        conn.commit()
+        cur.execute("SELECT * FROM reminders ORDER BY habit_id")
+        return [dict(row) for row in cur.fetchall()]
     except Exception as e:
-        print(f"❌ Ошибка сохранения настроек: {e}")
-        conn.rollback()
+        print(f"❌ Ошибка получения напоминаний: {e}")
+        return []
     finally:
         cur.close()
-        conn.close()
+
+
+def _advance_reminders(cur, now):
+    # Прошедшие срабатывания переносятся на следующее; обычно таких
+    # строк нет, и это один поиск по индексу next_fire_at
+    cur.execute("""
+        SELECT habit_id, time, repeat, days FROM reminders
+        WHERE next_fire_at <= ?
+    """, (now.strftime(_FIRE_FORMAT),))
+    updates = []
+    for habit_id, fire_time, repeat, days in cur.fetchall():
+        updates.append((_reminder_schedule(fire_time, repeat, days, now)[1], habit_id))
+    if updates:
+        cur.executemany("UPDATE reminders SET next_fire_at=? WHERE habit_id=?", updates)
+    return len(updates)
+
+
+def get_due_reminders(within_minutes=60, now=None):
+    """Напоминания, которые сработают в ближайшие within_minutes минут.
+
+    Одна выборка по диапазону next_fire_at (индекс), отсортированная по
+    времени срабатывания; уже прошедшие next_fire_at сначала
+    переносятся вперёд.
+    """
+    now = (now or datetime.now()).replace(second=0, microsecond=0)
+    until = now + timedelta(minutes=within_minutes)
+    with write_connection() as conn:
+        if conn is None:
+            return []
+        cur = conn.cursor()
+        try:
+            if _advance_reminders(cur, now):
+                conn.commit()
+            cur.execute("""
+                SELECT * FROM reminders
+                WHERE next_fire_at > ? AND next_fire_at <= ?
+                ORDER BY next_fire_at
+            """, (now.strftime(_FIRE_FORMAT), until.strftime(_FIRE_FORMAT)))
+            return [dict(row) for row in cur.fetchall()]
+        except Exception as e:
+            print(f"❌ Ошибка выборки напоминаний: {e}")
+            conn.rollback()
+            return []
+        finally:
+            cur.close()
+
+# ---------- CRUD SETTINGS ----------
+def save_settings(dark_theme, primary_color):
+    if DURABILITY == "batched":
+        # Переключатели на экране настроек: сохраняется последнее значение
+        _enqueue(("settings",),
+                 lambda cur: _write_settings(cur, dark_theme, primary_color),
+                 events.SETTINGS_SAVED)
+        return
+    with write_connection() as conn:
+        if conn is None:
+            return
+        cur = conn.cursor()
+        try:
+            _write_settings(cur, dark_theme, primary_color)
+            conn.commit()
+            events.publish(events.SETTINGS_SAVED)
+        except Exception as e:
+            print(f"❌ Ошибка сохранения настроек: {e}")
+            conn.rollback()
+        finally:
+            cur.close()
+
+
+def _write_settings(cur, dark_theme, primary_color):
+    cur.execute("""
+        INSERT OR REPLACE INTO settings (id, dark_theme, primary_color)
+        VALUES (1, ?, ?)
+    """, (dark_theme, primary_color))
+    return [(events.SETTINGS_SAVED, None)]
 
 
 def get_settings():
+    key = ("settings",)
+    hit, settings = _cache.lookup(key)
+    if hit:
+        return settings
+    generation = _cache.generation
     conn = get_connection()
     if conn is None:
         return None
@@ -332,15 +1603,527 @@ def get_settings():
     try:
         cur.execute("SELECT * FROM settings WHERE id=1")
         row = cur.fetchone()
-        return dict(row) if row else None
+        settings = dict(row) if row else None
+        _cache.put(key, settings, generation)
+        return settings
     except Exception as e:
         print(f"❌ Ошибка получения настроек: {e}")
         return None
     finally:
         cur.close()
-        conn.close()
+
+
+# ---------- ОБСЛУЖИВАНИЕ ----------
+# Удаление строк, ссылающихся на несуществующие привычки (остались от
+# старого редактирования через delete + add и от удалений без
+# foreign_keys), и возврат освободившегося места ОС.
+MAINTENANCE_INTERVAL = timedelta(days=7)
+MAINTENANCE_BATCH = 500        # строк за одну транзакцию
+MAINTENANCE_VACUUM_PAGES = 256  # страниц за один шаг incremental_vacuum
+
+# Таблица -> столбцы ключа строки (у WITHOUT ROWID-таблиц нет rowid)
+_CHILD_TABLES = {
+    "habit_logs": ("rowid",),
+    "reminders": ("rowid",),
+    "habit_streaks": ("rowid",),
+    "habit_rollups": ("habit_id", "granularity", "period"),
+}
+
+
+def _db_size(conn):
+    page_count = conn.execute("PRAGMA page_count").fetchone()[0]
+    page_size = conn.execute("PRAGMA page_size").fetchone()[0]
+    return page_count * page_size
+
+
+def sweep_orphans(batch_size=MAINTENANCE_BATCH, pause=0.01):
+    """Удаляет "осиротевшие" строки порциями по batch_size.
+
+    Каждая порция — отдельная короткая транзакция, между порциями
+    блокировка записи отпускается, так что запись из UI не ждёт.
+    Возвращает {таблица: удалено строк}.
+    """
+    deleted = {}
+    for table, key_columns in _CHILD_TABLES.items():
+        row_key = f"({', '.join(key_columns)})"
+        key_select = ", ".join(f"c.{column}" for column in key_columns)
+        deleted[table] = 0
+        while True:
+            with write_connection() as conn:
+                if conn is None:
+                    return deleted
+                cur = conn.cursor()
+                try:
+                    cur.execute(f"""
+                        DELETE FROM {table} WHERE {row_key} IN (
+                            SELECT {key_select} FROM {table} c
+                            LEFT JOIN habits h ON h.id = c.habit_id
+                            WHERE h.id IS NULL
+                            LIMIT ?
+                        )
+                    """, (batch_size,))
+                    count = cur.rowcount
+                    conn.commit()
+                except Exception as e:
+                    print(f"❌ Ошибка очистки {table}: {e}")
+                    conn.rollback()
+                    return deleted
+                finally:
+                    cur.close()
+            deleted[table] += count
+            if count < batch_size:
+                break
+            time.sleep(pause)
+    return deleted
+
+
+def enable_incremental_vacuum(conn):
+    """Переводит старую базу (без auto_vacuum) в режим INCREMENTAL.
+
+    Нужен один полный VACUUM. Старые версии SQLite не меняют
+    auto_vacuum в режиме WAL, поэтому сначала база пробует выйти из WAL
+    (получится, только если других подключений нет — без ожидания);
+    иначе VACUUM идёт в WAL, что поддерживают новые версии SQLite.
+    Вызывается из compact() в фоновом обслуживании, а не при запуске:
+    время VACUUM растёт с размером базы.
+    Возвращает True, если режим INCREMENTAL включён.
+    """
+    if conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2:
+        return True
+    conn.commit()
+    left_wal = False
+    try:
+        conn.execute("PRAGMA busy_timeout=0")
+        try:
+            mode = conn.execute("PRAGMA journal_mode=DELETE").fetchall()[0][0]
+            left_wal = mode.lower() == "delete"
+        except sqlite3.OperationalError:
+            pass  # база открыта другими подключениями
+        finally:
+            _apply_pragmas(conn)
+        conn.execute("PRAGMA auto_vacuum=INCREMENTAL")
+        conn.execute("VACUUM")
+        if not left_wal:
+            # Копия базы, которую VACUUM записал в WAL, — обратно в файл
+            conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+    except sqlite3.OperationalError as e:
+        print(f"⚠ Не удалось включить auto_vacuum: {e}")
+    finally:
+        if left_wal:
+            conn.execute("PRAGMA journal_mode=WAL").fetchall()
+    enabled = conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    if enabled:
+        print("🔧 Включено пошаговое сжатие БД (auto_vacuum=INCREMENTAL)")
+    else:
+        print("⚠ Эта версия SQLite не меняет auto_vacuum в режиме WAL")
+    return enabled
+
+
+def compact(pages=MAINTENANCE_VACUUM_PAGES, pause=0.01):
+    """Возвращает свободные страницы ОС через incremental_vacuum.
+
+    Сжатие идёт шагами по pages страниц. Старая база без auto_vacuum
+    сначала один раз переводится в режим INCREMENTAL (этот VACUUM и
+    сжимает её); если перевести не удалось, сжатие пропускается.
+    Возвращает (размер до, размер после) в байтах.
+    """
+    with write_connection() as conn:
+        if conn is None:
+            return 0, 0
+        before = _db_size(conn)
+        if conn.execute("PRAGMA auto_vacuum").fetchone()[0] != 2:
+            if enable_incremental_vacuum(conn):
+                return before, _db_size(conn)
+            print("ℹ️ auto_vacuum выключен, сжатие пропущено")
+            return before, before
+
+    while True:
+        with write_connection() as conn:
+            if conn is None:
+                break
+            if not conn.execute("PRAGMA freelist_count").fetchone()[0]:
+                break
+            # incremental_vacuum освобождает по странице на каждый шаг
+            conn.execute(f"PRAGMA incremental_vacuum({int(pages)})").fetchall()
+            conn.commit()
+        time.sleep(pause)
+
+    with write_connection() as conn:
+        if conn is None:
+            return before, before
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE)").fetchall()
+        return before, _db_size(conn)
+
+
+def maintenance_due():
+    conn = get_connection()
+    if conn is None:
+        return False
+    row = conn.execute("SELECT MAX(finished_at) FROM maintenance_runs").fetchone()
+    if not row or not row[0]:
+        return True
+    last_run = datetime.strptime(row[0], '%Y-%m-%d %H:%M:%S')
+    return datetime.utcnow() - last_run >= MAINTENANCE_INTERVAL
+
+
+def run_maintenance(force=False, batch_size=MAINTENANCE_BATCH):
+    """Очистка + сжатие, не чаще MAINTENANCE_INTERVAL (если не force).
+
+    Возвращает отчёт {"rows_deleted": {...}, "bytes_before", "bytes_after",
+    "bytes_reclaimed"} или None, если запуск не требуется.
+    """
+    try:
+        if not force and not maintenance_due():
+            return None
+
+        rows_deleted = sweep_orphans(batch_size)
+        bytes_before, bytes_after = compact()
+        report = {
+            "rows_deleted": rows_deleted,
+            "bytes_before": bytes_before,
+            "bytes_after": bytes_after,
+            "bytes_reclaimed": max(bytes_before - bytes_after, 0),
+        }
+
+        with write_connection() as conn:
+            if conn is not None:
+                conn.execute(
+                    "INSERT INTO maintenance_runs (rows_deleted, bytes_reclaimed) VALUES (?, ?)",
+                    (sum(rows_deleted.values()), report["bytes_reclaimed"])
+                )
+                conn.commit()
+
+        print(f"🧹 Обслуживание БД: удалено строк {sum(rows_deleted.values())}, "
+              f"освобождено {report['bytes_reclaimed']} байт")
+        return report
+    except Exception as e:
+        print(f"❌ Ошибка обслуживания БД: {e}")
+        return None
+
+
+# ---------- ЭКСПОРТ И ИМПОРТ ----------
+# Выгрузка всей базы в CSV или JSONL (с .gz — сжатый gzip). Таблицы
+# читаются курсором порциями по EXPORT_BATCH строк и сразу пишутся в
+# файл, так что память не растёт с размером базы.
+#
+# JSONL: строка {"table": "meta", ...}, затем по строке на запись:
+#   {"table": "habits", "row": {"id": 1, "name": ...}}
+# CSV: перед строками каждой таблицы — заголовок "#habits,id,name,...",
+#   у строк данных в первой колонке — имя таблицы.
+EXPORT_BATCH = 1000
+EXPORT_FORMAT_VERSION = 2  # 2: reminders.days — маска дней
+
+EXPORT_TABLES = (
+    ("habits", ("id", "name", "goal", "repeat", "created_at")),
+    ("habit_logs", ("id", "habit_id", "date", "created_at")),
+    ("reminders", ("habit_id", "time", "repeat", "days", "vibration", "sound", "text",
+                   "enabled")),
+    ("settings", ("dark_theme", "primary_color")),
+)
+
+
+def _export_format(path):
+    """("csv" | "jsonl", сжатие) по расширению файла"""
+    name = path.lower()
+    compressed = name.endswith(".gz")
+    if compressed:
+        name = name[:-3]
+    if name.endswith(".csv"):
+        return "csv", compressed
+    if name.endswith(".jsonl") or name.endswith(".json"):
+        return "jsonl", compressed
+    raise ValueError(f"Неизвестный формат файла: {path}")
+
+
+def _open_text(path, mode, compressed):
+    if compressed:
+        return gzip.open(path, mode + "t", encoding="utf-8", newline="")
+    return open(path, mode, encoding="utf-8", newline="")
+
+
+def export_data(path, progress=None, batch_size=EXPORT_BATCH):
+    """Выгружает базу в path; возвращает число записей или None при ошибке.
+
+    progress(выгружено, всего) вызывается после каждой порции — из
+    потока, который выполняет экспорт. Файл пишется во временный и
+    переименовывается в конце, так что недописанный экспорт не
+    заменит предыдущий.
+    """
+    fmt, compressed = _export_format(path)
+    conn = get_connection()
+    if conn is None:
+        return None
+    tmp_path = path + ".tmp"
+    cur = conn.cursor()
+    try:
+        # Одна транзакция чтения — согласованный снимок всех таблиц
+        cur.execute("BEGIN")
+        total = sum(cur.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+                    for table, _ in EXPORT_TABLES)
+        done = 0
+        with _open_text(tmp_path, "w", compressed) as out:
+            writer = csv.writer(out) if fmt == "csv" else None
+            if fmt == "jsonl":
+                out.write(json.dumps({
+                    "table": "meta",
+                    "version": EXPORT_FORMAT_VERSION,
+                    "schema": get_schema_version(conn),
+                    "exported_at": datetime.now().isoformat(timespec="seconds"),
+                }, ensure_ascii=False) + "\n")
+
+            for table, columns in EXPORT_TABLES:
+                if writer:
+                    writer.writerow(["#" + table, *columns])
+                cur.execute(f"SELECT {', '.join(columns)} FROM {table} ORDER BY rowid")
+                while True:
+                    rows = cur.fetchmany(batch_size)
+                    if not rows:
+                        break
+                    for row in rows:
+                        if writer:
+                            writer.writerow([table, *row])
+                        else:
+                            out.write(json.dumps({"table": table, "row": dict(zip(columns, row))},
+                                                 ensure_ascii=False) + "\n")
+                    done += len(rows)
+                    if progress:
+                        progress(done, total)
+        os.replace(tmp_path, path)
+        print(f"📤 Экспортировано записей: {done} → {path}")
+        return done
+    except Exception as e:
+        print(f"❌ Ошибка экспорта: {e}")
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        return None
+    finally:
+        cur.close()
+        if conn.in_transaction:
+            conn.rollback()
+
+
+# Импорт читает те же форматы построчно и пишет порциями по
+# IMPORT_BATCH записей (отметки — через executemany), по транзакции
+# на порцию.
+# Привычки получают новые id (привычка с тем же названием и
+# расписанием не дублируется), повторные отметки (habit_id, date)
+# пропускаются, серии и итоги пересчитываются один раз в конце.
+IMPORT_BATCH = 1000
+
+_INT_FIELDS = ("id", "habit_id", "vibration", "sound", "enabled", "dark_theme")
+
+
+def _read_export(path):
+    """Записи файла экспорта по одной: (таблица, dict)"""
+    fmt, compressed = _export_format(path)
+    with _open_text(path, "r", compressed) as source:
+        if fmt == "jsonl":
+            for line in source:
+                if line.strip():
+                    record = json.loads(line)
+                    if record.get("table") != "meta":
+                        yield record["table"], record.get("row") or {}
+            return
+        columns = {}
+        for row in csv.reader(source):
+            if not row:
+                continue
+            if row[0].startswith("#"):
+                columns[row[0][1:]] = row[1:]
+                continue
+            if row[0] in columns:
+                # В CSV нет NULL: пустая строка — отсутствующее значение
+                values = [value if value != "" else None for value in row[1:]]
+                record = dict(zip(columns[row[0]], values))
+                for field in _INT_FIELDS:
+                    if record.get(field) is not None:
+                        record[field] = int(record[field])
+                yield row[0], record
+
+
+def _batched(iterable, size):
+    """Списки по size элементов"""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+def _rebuild_derived(habit_ids):
+    """Пересчёт серий и итогов, по короткой транзакции на привычку"""
+    for habit_id in sorted(habit_ids):
+        with write_connection() as conn:
+            if conn is None:
+                return
+            cur = conn.cursor()
+            try:
+                _rebuild_streaks(cur, habit_id)
+                _rebuild_rollups(cur, habit_id)
+                conn.commit()
+            except Exception as e:
+                print(f"❌ Ошибка пересчёта после импорта: {e}")
+                conn.rollback()
+            finally:
+                cur.close()
+
+
+def import_data(path, progress=None, batch_size=IMPORT_BATCH):
+    """Загружает файл экспорта; возвращает счётчики или None при ошибке.
+
+    Блокировка записи берётся на каждую порцию и отпускается между
+    ними, так что запись из UI не ждёт конца импорта.
+    progress(обработано записей) вызывается после каждой порции.
+    """
+    result = {"habits": 0, "logs": 0, "duplicates": 0, "skipped": 0,
+              "reminders": 0, "settings": 0}
+    habit_ids = {}  # id в файле -> id в базе
+    existing = None  # (название, расписание) -> id в базе
+    touched = set()
+    processed = 0
+
+    def import_chunk(cur, chunk):
+        nonlocal existing
+        if existing is None:
+            cur.execute("SELECT id, name, repeat FROM habits")
+            existing = {(row["name"], row["repeat"]): row["id"] for row in cur.fetchall()}
+        logs = []
+        for table, row in chunk:
+            if table == "habits":
+                key = (row.get("name"), row.get("repeat"))
+                if not key[0]:
+                    result["skipped"] += 1
+                    continue
+                if key not in existing:
+                    cur.execute("""
+                        INSERT INTO habits (name, goal, repeat, created_at)
+                        VALUES (?, ?, ?, COALESCE(?, datetime('now')))
+                    """, (key[0], row.get("goal"), key[1], row.get("created_at")))
+                    existing[key] = cur.lastrowid
+                    result["habits"] += 1
+                habit_ids[row.get("id")] = existing[key]
+            elif table == "habit_logs":
+                habit_id = habit_ids.get(row.get("habit_id"))
+                try:
+                    day = streaks.to_day(row["date"])
+                except (KeyError, TypeError, ValueError):
+                    day = None
+                if habit_id is None or day is None:
+                    result["skipped"] += 1
+                    continue
+                logs.append((habit_id, streaks.from_day(day).isoformat(), day,
+                             row.get("created_at")))
+            elif table == "reminders":
+                habit_id = habit_ids.get(row.get("habit_id"))
+                if habit_id is None:
+                    result["skipped"] += 1
+                    continue
+                # Уже настроенное напоминание не перезаписываем; days
+                # в файлах версии 1 — текст, в версии 2 — маска. В
+                # старых файлах нет enabled — напоминание включено.
+                enabled = row.get("enabled")
+                enabled = 1 if enabled is None else int(bool(enabled))
+                mask, next_fire_at = _reminder_schedule(
+                    row.get("time"), row.get("repeat"), row.get("days"), enabled=enabled)
+                cur.execute("""
+                    INSERT INTO reminders
+                        (habit_id, time, repeat, days, vibration, sound, text, enabled,
+                         next_fire_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                    ON CONFLICT(habit_id) DO NOTHING
+                """, (habit_id, row.get("time"), row.get("repeat"), mask,
+                      row.get("vibration"), row.get("sound"), row.get("text"), enabled,
+                      next_fire_at))
+                result["reminders"] += max(cur.rowcount, 0)
+            elif table == "settings":
+                cur.execute("""
+                    INSERT INTO settings (id, dark_theme, primary_color) VALUES (1, ?, ?)
+                    ON CONFLICT(id) DO NOTHING
+                """, (row.get("dark_theme"), row.get("primary_color")))
+                result["settings"] += max(cur.rowcount, 0)
+            else:
+                result["skipped"] += 1
+        if logs:
+            cur.executemany("""
+                INSERT INTO habit_logs (habit_id, date, day, created_at)
+                VALUES (?, ?, ?, COALESCE(?, datetime('now')))
+                ON CONFLICT(habit_id, date) DO NOTHING
+            """, logs)
+            inserted = max(cur.rowcount, 0)
+            result["logs"] += inserted
+            result["duplicates"] += len(logs) - inserted
+            touched.update(row[0] for row in logs)
+
+    try:
+        for chunk in _batched(_read_export(path), batch_size):
+            with write_connection() as conn:
+                if conn is None:
+                    raise sqlite3.OperationalError("нет подключения к SQLite")
+                cur = conn.cursor()
+                try:
+                    import_chunk(cur, chunk)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                finally:
+                    cur.close()
+            processed += len(chunk)
+            if progress:
+                progress(processed)
+    except Exception as e:
+        print(f"❌ Ошибка импорта: {e}")
+        result = None
+
+    # Производная статистика — один раз на привычку, а не на отметку;
+    # после ошибки тоже: уже записанные порции остаются в базе
+    _rebuild_derived(touched)
+    if result is None:
+        published = [events.HABIT_ADDED, events.STREAKS_REBUILT]
+    else:
+        published = []
+        if result["habits"]:
+            published.append(events.HABIT_ADDED)
+        if touched:
+            published.append(events.STREAKS_REBUILT)
+        if result["reminders"]:
+            published.append(events.REMINDER_SAVED)
+        if result["settings"]:
+            published.append(events.SETTINGS_SAVED)
+    for kind in published:
+        events.publish(kind)
+    if result is not None:
+        print(f"📥 Импорт завершён: {result}")
+    return result
 
 
 # ---------- АВТОЗАПУСК ----------
 if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Обслуживание базы привычек")
+    parser.add_argument("command", nargs="?", default="init",
+                        choices=["init", "rebuild-streaks", "rebuild-rollups", "maintenance",
+                                 "export", "import"])
+    parser.add_argument("path", nargs="?",
+                        help="файл для export/import: .csv, .jsonl, с .gz — сжатый")
+    parser.add_argument("--db", default=DB_PATH, help="путь к файлу базы")
+    args = parser.parse_args()
+    if args.command in ("export", "import") and not args.path:
+        parser.error(f"для {args.command} нужен путь к файлу")
+
+    DB_PATH = args.db
     init_db()
+    if args.command == "rebuild-streaks":
+        rebuild_streaks()
+    elif args.command == "rebuild-rollups":
+        rebuild_rollups()
+    elif args.command == "maintenance":
+        run_maintenance(force=True)
+    elif args.command == "export":
+        export_data(args.path, progress=lambda done, total: print(f"  {done}/{total}"))
+    elif args.command == "import":
+        import_data(args.path, progress=lambda done: print(f"  {done}"))
+    close_connections()
+
@@ -0,0 +1,54 @@
+"""Уведомления об изменениях в базе.
+
+db.py публикует событие после каждой успешной записи, подписчики
+(экраны, кэш) обновляют только затронутые данные. Колбэки вызываются
+в потоке, который выполнил запись, поэтому должны быть быстрыми и
+потокобезопасными (экраны подписываются через app.db_async.subscribe).
+"""
+from collections import namedtuple
+import threading
+
+HABIT_ADDED = "habit_added"
+HABIT_UPDATED = "habit_updated"
+HABIT_DELETED = "habit_deleted"
+LOG_ADDED = "log_added"
+LOG_DELETED = "log_deleted"
+REMINDER_SAVED = "reminder_saved"
+SETTINGS_SAVED = "settings_saved"
+STREAKS_REBUILT = "streaks_rebuilt"
+
+# Группы событий для подписки
+HABIT_EVENTS = (HABIT_ADDED, HABIT_UPDATED, HABIT_DELETED)
+LOG_EVENTS = (LOG_ADDED, LOG_DELETED)
+
+ChangeEvent = namedtuple("ChangeEvent", ["kind", "habit_id"])
+
+_lock = threading.Lock()
+_subscribers = []  # (callback, kinds или None — все события)
+
+
+def subscribe(callback, kinds=None):
+    """Подписывает callback(event); возвращает функцию отписки"""
+    entry = (callback, frozenset(kinds) if kinds else None)
+    with _lock:
+        _subscribers.append(entry)
+
+    def unsubscribe():
+        with _lock:
+            if entry in _subscribers:
+                _subscribers.remove(entry)
+    return unsubscribe
+
+
+def publish(kind, habit_id=None):
+    event = ChangeEvent(kind, habit_id)
+    with _lock:
+        subscribers = list(_subscribers)
+    for callback, kinds in subscribers:
+        if kinds is not None and kind not in kinds:
+            continue
+        try:
+            callback(event)
+        except Exception as e:
+            print(f"❌ Ошибка обработчика события {kind}: {e}")
+    return event
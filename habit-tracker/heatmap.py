@@ -0,0 +1,105 @@
+"""Тепловая карта выполнений за год (как на GitHub).
+
+Сетка — недели по столбцам, дни недели (пн..вс) по строкам; ячейка i
+соответствует дню start + i (см. grid_start). Отметки раскладываются
+по ячейкам одной векторной операцией NumPy над номерами дней
+(streaks.to_day). NumPy указан в requirements.txt и buildozer.spec;
+если его всё же нет, тот же расчёт выполняется обычным циклом.
+"""
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+import streaks
+
+WEEKS = 53
+LEVELS = 4  # уровни интенсивности, не считая нулевого
+
+# Цвет пустой ячейки и самого высокого уровня (RGBA, 0..255)
+EMPTY_COLOR = (242, 242, 242, 255)
+FULL_COLOR = (51, 153, 255, 255)
+
+
+def grid_start(today=None, weeks=WEEKS):
+    """Понедельник первой недели сетки, которая заканчивается неделей today"""
+    today = streaks.today_day() if today is None else today
+    return streaks.week_start(streaks.week_index(today) - weeks + 1)
+
+
+def bucket(days, start, weeks=WEEKS):
+    """Число отметок в каждой ячейке (weeks * 7 значений).
+
+    days — номера дней в любом порядке, с повторами (по отметке на
+    привычку, если карта общая).
+    """
+    size = weeks * 7
+    if np is not None:
+        index = np.asarray(days, dtype=np.int64) - start
+        index = index[(index >= 0) & (index < size)]
+        return np.bincount(index, minlength=size)
+    counts = [0] * size
+    for day in days:
+        i = day - start
+        if 0 <= i < size:
+            counts[i] += 1
+    return counts
+
+
+def levels(counts, scale=None):
+    """Уровни 0..LEVELS.
+
+    scale — число отметок, которое даёт полный цвет (для общей карты —
+    число привычек); по умолчанию — максимум по сетке.
+    """
+    if np is not None:
+        counts = np.asarray(counts)
+        top = scale or int(counts.max(initial=0)) or 1
+        return (-(-np.minimum(counts, top) * LEVELS // top)).astype(np.uint8)
+    top = scale or max(counts, default=0) or 1
+    return [-(-min(count, top) * LEVELS // top) for count in counts]
+
+
+def compute(days, today=None, weeks=WEEKS, scale=None):
+    """(первый день сетки, уровни ячеек) — всё, что нужно для отрисовки"""
+    start = grid_start(today, weeks)
+    return start, levels(bucket(days, start, weeks), scale)
+
+
+def palette():
+    """Цвета уровней 0..LEVELS: от EMPTY_COLOR к FULL_COLOR"""
+    return [tuple(round(e + (f - e) * level / LEVELS) for e, f in zip(EMPTY_COLOR, FULL_COLOR))
+            for level in range(LEVELS + 1)]
+
+
+def to_rgba(cells, visible, weeks=WEEKS, cell=4, gap=1):
+    """Пиксели текстуры weeks*cell x 7*cell (RGBA, строки снизу вверх).
+
+    cells — уровни ячеек, visible — сколько первых ячеек показывать
+    (дни после сегодня остаются прозрачными). Между ячейками — gap
+    прозрачных пикселей.
+    """
+    colors = palette() + [(0, 0, 0, 0)]
+    hidden = len(colors) - 1
+    if np is not None:
+        index = np.asarray(cells, dtype=np.intp).copy()
+        index[visible:] = hidden
+        # Строки — дни недели; текстура идёт снизу вверх, понедельник сверху
+        grid = index.reshape(weeks, 7).T[::-1]
+        image = np.asarray(colors, dtype=np.uint8)[grid]
+        image = image.repeat(cell, axis=0).repeat(cell, axis=1)
+        image[np.arange(7 * cell) % cell >= cell - gap] = 0
+        image[:, np.arange(weeks * cell) % cell >= cell - gap] = 0
+        return image.tobytes()
+
+    blank = bytes(4 * gap)
+    rows = []
+    for weekday in range(6, -1, -1):
+        row = bytearray()
+        for week in range(weeks):
+            i = week * 7 + weekday
+            color = bytes(colors[cells[i] if i < visible else hidden])
+            row += color * (cell - gap) + blank
+        rows.extend([bytes(row)] * (cell - gap))
+        rows.extend([bytes(4 * cell * weeks)] * gap)
+    return b"".join(rows)
@@ -1,22 +1,21 @@
+import time
+
+_STARTED = time.perf_counter()  # отсчёт времени запуска (см. on_start)
+
 from kivy.lang import Builder
 from kivymd.app import MDApp
-from kivy.uix.screenmanager import ScreenManager
+from kivy.uix.screenmanager import ScreenManager, ScreenManagerException
+from kivy.properties import AliasProperty
 from kivy.config import Config
+from kivy.clock import Clock
+import importlib
 import os
-from app import db
+from app import db, db_async
 import sys
 
 print("🐍 Python encoding:", sys.getdefaultencoding())
 print("🐍 Filesystem encoding:", sys.getfilesystemencoding())
 
-# Правильные импорты из папки screens
-from app.screens.habit_list import HabitListScreen
-from app.screens.habit_add import HabitAddScreen
-from app.screens.habit_stats import HabitStatsScreen
-from app.screens.reminders import RemindersScreen
-from app.screens.settings import SettingsScreen
-from app.screens.habit_edit import HabitEditScreen
-
 Config.set('input', 'mouse', 'mouse,multitouch_on_demand')
 
 # Пробуем инициализировать БД
@@ -27,65 +26,145 @@ except Exception as e:
     print(f"Ошибка БД: {e}")
 
 
+# Экраны: имя -> (модуль, класс, KV-файл). Модуль, его виджеты KivyMD
+# и KV-правила загружаются при первом переходе на экран, а не при
+# запуске; первым создаётся START_SCREEN.
+SCREENS = {
+    "habit_list": ("app.screens.habit_list", "HabitListScreen", "habit_tracker.kv"),
+    "habit_add": ("app.screens.habit_add", "HabitAddScreen", "habit_add.kv"),
+    "habit_stats": ("app.screens.habit_stats", "HabitStatsScreen", "habit_stats.kv"),
+    "reminders": ("app.screens.reminders", "RemindersScreen", "reminders.kv"),
+    "settings": ("app.screens.settings", "SettingsScreen", "settings.kv"),
+    "habit_edit": ("app.screens.habit_edit", "HabitEditScreen", "habit_edit.kv"),
+}
+START_SCREEN = "habit_list"
+KV_DIR = "app/kv"
+# PRELOAD — создавать остальные экраны заранее, по одному с паузой
+# PRELOAD_INTERVAL секунд. По умолчанию выключено: таймер не знает,
+# занят ли пользователь, и создание экрана попадает на его первые
+# жесты; экран создаётся при первом переходе на него
+PRELOAD = False
+PRELOAD_INTERVAL = 0.1
+
+_loaded_kv = set()
+
+
 class HabitScreenManager(ScreenManager):
+    def _get_screen_names(self):
+        # Ещё не созданные экраны тоже считаются существующими: проверки
+        # вида `"habit_add" in manager.screen_names` работают как раньше
+        names = [screen.name for screen in self.screens]
+        return names + [name for name in SCREENS if name not in names]
+
+    screen_names = AliasProperty(_get_screen_names, bind=("screens",))
+
+    def get_screen(self, name):
+        # Переход (current = name) тоже идёт через get_screen
+        try:
+            return super().get_screen(name)
+        except ScreenManagerException:
+            if name not in SCREENS:
+                raise
+            return self.load_screen(name)
+
+    def is_loaded(self, name):
+        return any(screen.name == name for screen in self.screens)
+
+    def load_screen(self, name):
+        """Импортирует модуль экрана, загружает его KV и создаёт экран"""
+        if self.is_loaded(name):
+            return super().get_screen(name)
+        module_name, class_name, kv_file = SCREENS[name]
+        started = time.perf_counter()
+        screen_class = getattr(importlib.import_module(module_name), class_name)
+        if kv_file not in _loaded_kv:
+            Builder.load_file(os.path.join(KV_DIR, kv_file))
+            _loaded_kv.add(kv_file)
+        screen = screen_class(name=name)
+        self.add_widget(screen)
+        print(f"✅ Добавлен экран: {name} ({(time.perf_counter() - started) * 1000:.0f} мс)")
+        return screen
+
+    def preload(self, names=None):
+        """Создаёт ещё не загруженные экраны по одному между кадрами"""
+        queue = [name for name in (names or SCREENS) if not self.is_loaded(name)]
+
+        def step(dt):
+            while queue:
+                name = queue.pop(0)
+                if not self.is_loaded(name):
+                    try:
+                        self.load_screen(name)
+                    except Exception as e:
+                        print(f"❌ Ошибка загрузки экрана {name}: {e}")
+                    break
+            if queue:
+                Clock.schedule_once(step, PRELOAD_INTERVAL)
+
+        Clock.schedule_once(step, PRELOAD_INTERVAL)
+
     def add_habit(self):
         if "habit_add" in self.screen_names:
             self.current = "habit_add"
 
 
 class HabitTrackerApp(MDApp):
+    reminder_scheduler = None
+
     def build(self):
         self.theme_cls.primary_palette = "DeepPurple"
 
-        # Загружаем KV файлы из папки kv
-        kv_files = [
-            "habit_tracker.kv",
-            "habit_add.kv",
-            "habit_stats.kv",
-            "reminders.kv",
-            "settings.kv",
-            "habit_edit.kv"
-        ]
-
-        print("🔍 Начинаем загрузку KV файлов...")
-
-        # Просто загружаем файлы без сложных проверок
-        loaded_files = []
-        for kv_file in kv_files:
-            try:
-                kv_path = os.path.join("app/kv", kv_file)
-                Builder.load_file(kv_path)
-                loaded_files.append(kv_file)
-                print(f"✅ Загружен {kv_file}")
-            except Exception as e:
-                print(f"❌ Ошибка загрузки {kv_file}: {e}")
-
-        print(f"📁 Всего загружено KV файлов: {len(loaded_files)}")
-
-        # Создаем ScreenManager и добавляем экраны
+        # Сразу создаётся только стартовый экран (см. SCREENS)
         sm = HabitScreenManager()
-
-        # Добавляем экраны
-        screens = [
-            ("habit_list", HabitListScreen),
-            ("habit_add", HabitAddScreen),
-            ("habit_stats", HabitStatsScreen),
-            ("reminders", RemindersScreen),
-            ("settings", SettingsScreen),
-            ("habit_edit", HabitEditScreen)
-        ]
-
-        for name, screen_class in screens:
-            if not sm.has_screen(name):
-                sm.add_widget(screen_class(name=name))
-                print(f"✅ Добавлен экран: {name}")
-
-        print("✅ Все экраны добавлены")
+        sm.load_screen(START_SCREEN)
+        print(f"⏱ Интерфейс построен за {(time.perf_counter() - _STARTED) * 1000:.0f} мс от запуска")
         return sm
 
     def on_start(self):
-        settings_screen = self.root.get_screen("settings")
-        settings_screen.on_enter()
+        print(f"⏱ Запуск до первого экрана: {(time.perf_counter() - _STARTED) * 1000:.0f} мс")
+
+        # Тема из настроек применяется экраном настроек — создаём его
+        # следующим кадром, после показа списка
+        Clock.schedule_once(lambda dt: self.root.get_screen("settings").on_enter())
+        if PRELOAD:
+            self.root.preload()
+
+        # Очистка и сжатие БД в фоне, когда стартовая загрузка уже прошла
+        # (сама проверяет, пора ли: не чаще db.MAINTENANCE_INTERVAL)
+        Clock.schedule_once(lambda dt: db_async.submit(db.run_maintenance), 30)
+
+        # Напоминания: одна куча и один таймер на ближайшее срабатывание
+        import scheduler
+        self.reminder_scheduler = scheduler.ReminderScheduler()
+        db_async.submit(db.get_reminders, on_result=self.reminder_scheduler.load)
+        db_async.subscribe(self.on_reminders_changed,
+                           (db.events.REMINDER_SAVED, db.events.HABIT_DELETED))
+
+    def on_reminders_changed(self, changes):
+        # Пересчитываем только изменённые напоминания; событие без
+        # habit_id (импорт) — перечитываем все
+        habit_ids = {change.habit_id for change in changes}
+        if None in habit_ids:
+            db_async.submit(db.get_reminders, on_result=self.reminder_scheduler.load)
+            return
+        for habit_id in habit_ids:
+            db_async.submit(db.get_reminder, habit_id,
+                            on_result=lambda reminder, habit_id=habit_id:
+                            self.reminder_scheduler.update(habit_id, reminder))
+
+    def on_pause(self):
+        # Android может завершить приложение в фоне без on_stop —
+        # сохраняем отложенные отметки и настройки (см. db.flush)
+        db.flush()
+        return True
+
+    def on_stop(self):
+        # Дожидаемся фоновых запросов и закрываем постоянные
+        # подключения к SQLite (очередь записи сохраняется там же)
+        if self.reminder_scheduler is not None:
+            self.reminder_scheduler.stop()
+        db_async.shutdown()
+        db.close_connections()
 
     def back(self):
         if self.root and 'habit_list' in self.root.screen_names:
@@ -0,0 +1,212 @@
+"""Планировщик напоминаний.
+
+Для каждого напоминания считается ближайшее время срабатывания (по
+времени, режиму повтора и дням недели). Все ожидающие срабатывания
+лежат в одной куче, и взведён один таймер — на самое раннее. Изменение
+напоминания пересчитывает только его запись: старая запись в куче не
+удаляется, а помечается устаревшей (по номеру версии) и пропускается,
+когда оказывается наверху.
+
+Уведомления отправляет notifier — объект с методом notify(reminder):
+PlyerNotifier (системные уведомления, если установлен plyer),
+LogNotifier (печать в консоль) или RecordingNotifier (для проверок).
+"""
+from datetime import datetime, timedelta
+import heapq
+import threading
+
+import streaks
+
+
+# ---------- РАСПИСАНИЕ ----------
+def weekday_mask(repeat, days=None):
+    """Дни срабатывания битовой маской (понедельник — бит 0).
+
+    repeat — значение с экрана напоминаний ("daily", "weekdays",
+    "weekends", "custom"); для "custom" дни берутся из days (маска,
+    список или строка названий).
+    """
+    if (repeat or "").strip().lower() == "custom":
+        return days if isinstance(days, int) else streaks.parse_weekdays(days)
+    return streaks.Schedule.parse(repeat).mask
+
+
+def parse_time(value):
+    """'HH:MM' -> (часы, минуты) или None"""
+    try:
+        hours, minutes = (int(part) for part in str(value).split(":"))
+    except (TypeError, ValueError):
+        return None
+    if 0 <= hours < 24 and 0 <= minutes < 60:
+        return hours, minutes
+    return None
+
+
+def next_fire(time, mask, after=None):
+    """Ближайшее срабатывание строго позже after (datetime) или None"""
+    parsed = parse_time(time)
+    if parsed is None or not mask:
+        return None
+    after = after or datetime.now()
+    start = after.replace(hour=parsed[0], minute=parsed[1], second=0, microsecond=0)
+    for offset in range(8):
+        candidate = start + timedelta(days=offset)
+        if mask >> candidate.weekday() & 1 and candidate > after:
+            return candidate
+    return None
+
+
+def reminder_fire(reminder, after=None):
+    """next_fire для строки таблицы reminders (None, если выключено)"""
+    if not reminder or not reminder.get("enabled", 1):
+        return None
+    return next_fire(reminder.get("time"),
+                     weekday_mask(reminder.get("repeat"), reminder.get("days")),
+                     after)
+
+
+# ---------- УВЕДОМЛЕНИЯ ----------
+class LogNotifier:
+    def notify(self, reminder):
+        print(f"🔔 Напоминание для привычки {reminder.get('habit_id')}: {reminder.get('text')}")
+
+
+class RecordingNotifier:
+    """Запоминает уведомления вместо показа — для проверок"""
+
+    def __init__(self):
+        self.sent = []
+
+    def notify(self, reminder):
+        self.sent.append(reminder)
+
+
+class PlyerNotifier:
+    def notify(self, reminder):
+        from plyer import notification
+        notification.notify(title="Трекер привычек",
+                            message=reminder.get("text") or "Не забыть выполнить привычку")
+
+
+def default_notifier():
+    # plyer импортируется только здесь: db загружает этот модуль при
+    # запуске ради расчёта расписания, а уведомления нужны позже
+    try:
+        import plyer  # noqa: F401
+    except ImportError:
+        return LogNotifier()
+    return PlyerNotifier()
+
+
+# ---------- ПЛАНИРОВЩИК ----------
+class ReminderScheduler:
+    """Куча (время, habit_id, версия) и один таймер на её вершину.
+
+    Методы можно вызывать из любого потока; notifier вызывается в
+    потоке таймера.
+    """
+
+    def __init__(self, notifier=None, timer_factory=threading.Timer, clock=datetime.now):
+        self.notifier = notifier or default_notifier()
+        self._timer_factory = timer_factory
+        self._clock = clock
+        self._heap = []
+        self._entries = {}  # habit_id -> (время, версия, напоминание)
+        self._version = 0
+        self._timer = None
+        self._armed_at = None
+        self._lock = threading.RLock()
+
+    def load(self, reminders):
+        """Заменяет все напоминания (строки таблицы reminders)"""
+        with self._lock:
+            now = self._clock()
+            self._heap = []
+            self._entries = {}
+            for reminder in reminders:
+                entry = self._add(reminder, now)
+                if entry is not None:
+                    self._heap.append(entry)
+            heapq.heapify(self._heap)
+            self._arm()
+
+    def update(self, habit_id, reminder):
+        """Пересчитывает одно напоминание; reminder=None — удалить"""
+        with self._lock:
+            self._entries.pop(habit_id, None)
+            entry = self._add(reminder, self._clock()) if reminder else None
+            if entry is not None:
+                heapq.heappush(self._heap, entry)
+            self._arm()
+
+    def next_due(self):
+        """(время, напоминание) ближайшего срабатывания или None"""
+        with self._lock:
+            self._drop_stale()
+            if not self._heap:
+                return None
+            fire_at, habit_id, _ = self._heap[0]
+            return fire_at, self._entries[habit_id][2]
+
+    def stop(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+            self._timer = None
+            self._armed_at = None
+
+    def _add(self, reminder, now):
+        """Новая версия записи; элемент для кучи кладёт вызывающий"""
+        fire_at = reminder_fire(reminder, now)
+        if fire_at is None:
+            return None
+        self._version += 1
+        self._entries[reminder["habit_id"]] = (fire_at, self._version, reminder)
+        return fire_at, reminder["habit_id"], self._version
+
+    def _drop_stale(self):
+        heap = self._heap
+        while heap:
+            fire_at, habit_id, version = heap[0]
+            entry = self._entries.get(habit_id)
+            if entry is not None and entry[1] == version:
+                return
+            heapq.heappop(heap)
+
+    def _arm(self):
+        self._drop_stale()
+        fire_at = self._heap[0][0] if self._heap else None
+        if fire_at == self._armed_at:
+            return
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._armed_at = fire_at
+        if fire_at is not None:
+            delay = max((fire_at - self._clock()).total_seconds(), 0)
+            self._timer = self._timer_factory(delay, self._fire)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def _fire(self):
+        due = []
+        with self._lock:
+            self._timer = None
+            self._armed_at = None
+            now = self._clock()
+            self._drop_stale()
+            while self._heap and self._heap[0][0] <= now:
+                _, habit_id, _ = heapq.heappop(self._heap)
+                reminder = self._entries.pop(habit_id)[2]
+                due.append(reminder)
+                # Следующее срабатывание того же напоминания
+                entry = self._add(reminder, now)
+                if entry is not None:
+                    heapq.heappush(self._heap, entry)
+                self._drop_stale()
+            self._arm()
+        for reminder in due:
+            try:
+                self.notifier.notify(reminder)
+            except Exception as e:
+                print(f"❌ Ошибка отправки напоминания: {e}")
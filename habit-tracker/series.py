@@ -0,0 +1,96 @@
+"""Компактный ряд выполнений привычки.
+
+CompletionSeries хранит отсортированные номера дней (от 1970-01-01,
+см. streaks.to_day) в array('i') — 4 байта на отметку вместо строки
+'YYYY-MM-DD'. Проверка дня — бинарный поиск, срезы по датам не
+копируют строки и не разбирают их.
+"""
+from array import array
+from bisect import bisect_left, bisect_right
+
+import streaks
+
+
+def _as_day(value):
+    if isinstance(value, int):
+        return value
+    return streaks.to_day(value)
+
+
+class CompletionSeries:
+    __slots__ = ("_days", "schedule")
+
+    def __init__(self, days=(), schedule=None, presorted=False):
+        if not presorted:
+            days = sorted(set(days))
+        self._days = days if isinstance(days, array) else array("i", days)
+        self.schedule = schedule or streaks.Schedule()
+
+    # --- последовательность ---
+    def __len__(self):
+        return len(self._days)
+
+    def __bool__(self):
+        return bool(self._days)
+
+    def __iter__(self):
+        return iter(self._days)
+
+    def __reversed__(self):
+        return reversed(self._days)
+
+    def __contains__(self, value):
+        return self.contains(value)
+
+    def __eq__(self, other):
+        return isinstance(other, CompletionSeries) and self._days == other._days
+
+    def __repr__(self):
+        return f"CompletionSeries({len(self._days)} days)"
+
+    @property
+    def days(self):
+        return self._days
+
+    @property
+    def first(self):
+        return self._days[0] if self._days else None
+
+    @property
+    def last(self):
+        return self._days[-1] if self._days else None
+
+    def contains(self, value):
+        """Есть ли отметка в этот день — O(log n)"""
+        day = _as_day(value)
+        i = bisect_left(self._days, day)
+        return i < len(self._days) and self._days[i] == day
+
+    def dates(self, reverse=False):
+        days = reversed(self._days) if reverse else self._days
+        return (streaks.from_day(day) for day in days)
+
+    # --- срезы ---
+    def slice(self, start=None, end=None):
+        """Отметки с start по end включительно (номер дня, date или строка)"""
+        lo = 0 if start is None else bisect_left(self._days, _as_day(start))
+        hi = len(self._days) if end is None else bisect_right(self._days, _as_day(end))
+        return CompletionSeries(self._days[lo:hi], self.schedule, presorted=True)
+
+    def count(self, start=None, end=None):
+        lo = 0 if start is None else bisect_left(self._days, _as_day(start))
+        hi = len(self._days) if end is None else bisect_right(self._days, _as_day(end))
+        return max(hi - lo, 0)
+
+    def last_days(self, n, today=None):
+        """Отметки за последние n дней, включая сегодня"""
+        today = streaks.today_day() if today is None else _as_day(today)
+        return self.slice(today - n + 1, today)
+
+    # --- серии ---
+    def current_streak(self, today=None):
+        return streaks.current_streak(self._days, self.schedule,
+                                      None if today is None else _as_day(today))
+
+    def longest_streak(self):
+        return streaks.longest_streak(self._days, self.schedule)
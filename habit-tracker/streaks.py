@@ -0,0 +1,212 @@
+"""Расчёт серий выполнения привычек.
+
+Дни представлены целыми числами — номером дня от 1970-01-01
+(см. to_day/from_day). Расписание привычки (Schedule) переводит день в
+номер "периода": для ежедневной привычки период — это день, для
+еженедельной — неделя, для привычки по дням недели — очередной
+запланированный день. Серия — это отмеченные периоды подряд.
+"""
+from datetime import date
+
+EPOCH_ORDINAL = date(1970, 1, 1).toordinal()
+
+DAILY = "Ежедневно"
+WEEKLY = "Еженедельно"
+
+# Понедельник — бит 0, воскресенье — бит 6
+WEEKDAY_NAMES = ("Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun")
+_WEEKDAY_ALIASES = {
+    "mon": 0, "tue": 1, "wed": 2, "thu": 3, "fri": 4, "sat": 5, "sun": 6,
+    "пн": 0, "вт": 1, "ср": 2, "чт": 3, "пт": 4, "сб": 5, "вс": 6,
+}
+ALL_DAYS = 0b1111111
+WORKDAYS = 0b0011111
+WEEKENDS = 0b1100000
+
+_REPEAT_ALIASES = {
+    "": ("daily", ALL_DAYS),
+    "daily": ("daily", ALL_DAYS),
+    "ежедневно": ("daily", ALL_DAYS),
+    "каждый день": ("daily", ALL_DAYS),
+    "weekly": ("weekly", ALL_DAYS),
+    "еженедельно": ("weekly", ALL_DAYS),
+    "weekdays": ("days", WORKDAYS),
+    "по рабочим дням": ("days", WORKDAYS),
+    "weekends": ("days", WEEKENDS),
+    "по выходным": ("days", WEEKENDS),
+}
+
+
+def to_day(value):
+    """'YYYY-MM-DD' или date -> номер дня от 1970-01-01"""
+    if isinstance(value, str):
+        value = date.fromisoformat(value)
+    return value.toordinal() - EPOCH_ORDINAL
+
+
+def from_day(day):
+    return date.fromordinal(day + EPOCH_ORDINAL)
+
+
+def today_day():
+    return to_day(date.today())
+
+
+def weekday(day):
+    # 1970-01-01 — четверг
+    return (day + 3) % 7
+
+
+def week_index(day):
+    """Номер недели, недели начинаются с понедельника"""
+    return (day + 3) // 7
+
+
+def week_start(week):
+    """Понедельник недели week_index -> номер дня"""
+    return week * 7 - 3
+
+
+def month_index(day):
+    """Номер месяца от начала эпохи: год * 12 + (месяц - 1)"""
+    d = from_day(day)
+    return d.year * 12 + d.month - 1
+
+
+def month_start(month):
+    """Первое число месяца month_index -> номер дня"""
+    return to_day(date(month // 12, month % 12 + 1, 1))
+
+
+def parse_weekdays(value):
+    """Список/строка дней ('Mon', 'Пн', ...) -> битовая маска"""
+    if isinstance(value, str):
+        value = value.replace(",", " ").split()
+    mask = 0
+    for name in value or ():
+        name = str(name).strip().lower()
+        index = _WEEKDAY_ALIASES.get(name[:3], _WEEKDAY_ALIASES.get(name[:2]))
+        if index is not None:
+            mask |= 1 << index
+    return mask
+
+
+class Schedule:
+    """Расписание привычки: ежедневно, еженедельно или по дням недели"""
+    __slots__ = ("kind", "mask", "_per_week")
+
+    def __init__(self, kind="daily", mask=ALL_DAYS):
+        if kind == "days" and mask == ALL_DAYS:
+            kind = "daily"
+        self.kind = kind
+        self.mask = mask if kind == "days" else ALL_DAYS
+        self._per_week = bin(self.mask).count("1")
+
+    @classmethod
+    def parse(cls, repeat):
+        """Значение habits.repeat -> Schedule (неизвестное — ежедневно)"""
+        key = (repeat or "").strip().lower()
+        if key in _REPEAT_ALIASES:
+            return cls(*_REPEAT_ALIASES[key])
+        mask = parse_weekdays(key)
+        return cls("days", mask) if mask else cls()
+
+    def period(self, day):
+        if self.kind == "daily":
+            return day
+        week = week_index(day)
+        if self.kind == "weekly":
+            return week
+        # Отметка в незапланированный день засчитывается предыдущему
+        # запланированному дню
+        rank = bin(self.mask & ((2 << weekday(day)) - 1)).count("1")
+        return week * self._per_week + rank - 1
+
+    def __eq__(self, other):
+        return isinstance(other, Schedule) and (self.kind, self.mask) == (other.kind, other.mask)
+
+    def __repr__(self):
+        return f"Schedule({self.kind!r}, {self.mask:#09b})"
+
+
+def is_alive(last_day, schedule, today=None):
+    """Серия, закончившаяся в last_day, ещё не прервана.
+
+    Текущий период ещё не закончился, поэтому серия жива, если отмечен
+    текущий или предыдущий период (для ежедневной — сегодня или вчера).
+    """
+    if last_day is None:
+        return False
+    if today is None:
+        today = today_day()
+    return schedule.period(last_day) >= schedule.period(today) - 1
+
+
+def current_streak(days, schedule=None, today=None):
+    """Текущая серия по отсортированным номерам дней.
+
+    Идём с конца и останавливаемся на первом пропуске — O(длины серии),
+    без ограничения сверху.
+    """
+    if not days:
+        return 0
+    schedule = schedule or Schedule()
+    if not is_alive(days[-1], schedule, today):
+        return 0
+    return tail_run(days, schedule)
+
+
+def tail_run(days, schedule=None):
+    """Длина серии (в периодах), которая заканчивается последним днём"""
+    if not days:
+        return 0
+    schedule = schedule or Schedule()
+    expected = schedule.period(days[-1])
+    streak = 0
+    for i in range(len(days) - 1, -1, -1):
+        period = schedule.period(days[i])
+        if period == expected:
+            streak += 1
+            expected -= 1
+        elif period != expected + 1:
+            break
+    return streak
+
+
+def longest_streak(days, schedule=None):
+    if not days:
+        return 0
+    schedule = schedule or Schedule()
+    longest = current = 0
+    previous = None
+    for day in days:
+        period = schedule.period(day)
+        if period == previous:
+            continue
+        current = current + 1 if previous is not None and period == previous + 1 else 1
+        longest = max(longest, current)
+        previous = period
+    return longest
+
+
+def advance(tail, last_day, day, schedule=None):
+    """Новая длина хвостовой серии после отметки day >= last_day — O(1)"""
+    schedule = schedule or Schedule()
+    if last_day is None:
+        return 1
+    step = schedule.period(day) - schedule.period(last_day)
+    if step == 0:
+        return tail
+    return tail + 1 if step == 1 else 1
+
+
+def summarize(days, schedule=None):
+    """Сводка для habit_streaks по отсортированным номерам дней"""
+    schedule = schedule or Schedule()
+    return {
+        "current_streak": tail_run(days, schedule),
+        "longest_streak": longest_streak(days, schedule),
+        "total": len(days),
+        "last_done": from_day(days[-1]).isoformat() if days else None,
+        "first_done": from_day(days[0]).isoformat() if days else None,
+    }
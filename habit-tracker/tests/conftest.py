@@ -0,0 +1,20 @@
+import os
+import sys
+
+import pytest
+
+# Модули приложения (db, streaks, ...) лежат в корне habit-tracker
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import db  # noqa: E402
+
+
+@pytest.fixture
+def fresh_db(tmp_path, monkeypatch):
+    """Пустая база во временном каталоге, запись без очереди"""
+    db.close_connections()
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "habits.db"))
+    monkeypatch.setattr(db, "DURABILITY", "immediate")
+    assert db.init_db()
+    yield db
+    db.close_connections()
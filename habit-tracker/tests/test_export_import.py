@@ -0,0 +1,55 @@
+"""Выгрузка базы и загрузка файла экспорта обратно"""
+import pytest
+
+import db
+import streaks
+
+
+def _fill(db):
+    today = streaks.today_day()
+    run = db.add_habit("Бег", "5 км", "daily")
+    read = db.add_habit("Чтение", "", "weekdays")
+    for k in range(40):
+        db.log_habit_done(run, streaks.from_day(today - k).isoformat())
+        if k % 3:
+            db.log_habit_done(read, streaks.from_day(today - k).isoformat())
+    db.save_reminder(run, "07:30", "custom", ["Mon", "Thu"], 1, 0, "Пора бежать")
+    db.save_reminder(read, "21:00", "daily", [], 0, 1, "Почитать", enabled=False)
+    db.save_settings(True, "#4CAF50")
+
+
+def _snapshot(db):
+    conn = db.get_connection()
+    # В CSV пустая строка и NULL неразличимы
+    habits = {row["id"]: (row["name"], row["goal"] or "", row["repeat"])
+              for row in conn.execute("SELECT * FROM habits")}
+    logs = sorted((habits[row["habit_id"]][0], row["date"])
+                  for row in conn.execute("SELECT habit_id, date FROM habit_logs"))
+    reminders = sorted((habits[row["habit_id"]][0], row["time"], row["repeat"], row["days"],
+                        row["enabled"], row["text"])
+                       for row in conn.execute("SELECT * FROM reminders"))
+    streak_rows = sorted((habits[row["habit_id"]][0],) + tuple(row)[1:]
+                         for row in conn.execute("SELECT * FROM habit_streaks"))
+    return sorted(habits.values()), logs, reminders, streak_rows, db.get_settings()
+
+
+@pytest.mark.parametrize("name", ["backup.jsonl", "backup.jsonl.gz", "backup.csv"])
+def test_round_trip(fresh_db, tmp_path, monkeypatch, name):
+    db = fresh_db
+    _fill(db)
+    expected = _snapshot(db)
+    path = str(tmp_path / name)
+    assert db.export_data(path, batch_size=7) is not None
+
+    db.close_connections()
+    monkeypatch.setattr(db, "DB_PATH", str(tmp_path / "restored.db"))
+    assert db.init_db()
+    result = db.import_data(path, batch_size=7)
+    assert result["habits"] == 2 and result["duplicates"] == 0 and result["skipped"] == 0
+    assert _snapshot(db) == expected
+
+    # Повторный импорт ничего не дублирует
+    again = db.import_data(path, batch_size=7)
+    assert again["habits"] == again["logs"] == again["reminders"] == 0
+    assert again["duplicates"] == result["logs"]
+    assert _snapshot(db) == expected
@@ -0,0 +1,145 @@
+"""Обновление базы со схемы первой версии приложения до текущей"""
+import sqlite3
+import time
+
+import pytest
+
+import db
+import streaks
+
+# Схема, которую создавал init_db() до миграций (user_version = 0)
+BASELINE_SCHEMA = """
+CREATE TABLE habits (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL,
+    goal TEXT,
+    repeat TEXT,
+    created_at TEXT DEFAULT (datetime('now'))
+);
+CREATE TABLE habit_logs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    habit_id INTEGER REFERENCES habits(id) ON DELETE CASCADE,
+    date TEXT NOT NULL DEFAULT (date('now')),
+    created_at TEXT DEFAULT (datetime('now'))
+);
+CREATE TABLE reminders (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    habit_id INTEGER UNIQUE REFERENCES habits(id) ON DELETE CASCADE,
+    time TEXT,
+    repeat TEXT,
+    days TEXT,
+    vibration INTEGER,
+    sound INTEGER,
+    text TEXT
+);
+CREATE TABLE settings (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    dark_theme INTEGER,
+    primary_color TEXT
+);
+"""
+
+
+@pytest.fixture
+def baseline_db(tmp_path, monkeypatch):
+    """База старой версии: дубли отметок, "осиротевшие" строки, дни текстом"""
+    path = tmp_path / "habits.db"
+    today = streaks.today_day()
+    conn = sqlite3.connect(path)
+    conn.executescript(BASELINE_SCHEMA)
+    conn.execute("INSERT INTO habits (id, name, goal, repeat) VALUES (1, 'Бег', '', 'daily')")
+    conn.execute("INSERT INTO habits (id, name, goal, repeat) VALUES (2, 'Чтение', '', 'weekly')")
+    dates = [streaks.from_day(today - k).isoformat() for k in (0, 1, 2, 5, 14)]
+    conn.executemany("INSERT INTO habit_logs (habit_id, date) VALUES (?, ?)",
+                     [(1, date) for date in dates] + [(2, date) for date in dates])
+    conn.execute("INSERT INTO habit_logs (habit_id, date) VALUES (1, ?)", (dates[0],))
+    # Остались от удалённой привычки (в старой версии foreign_keys выключены)
+    conn.execute("INSERT INTO habit_logs (habit_id, date) VALUES (99, ?)", (dates[0],))
+    conn.execute("""
+        INSERT INTO reminders (habit_id, time, repeat, days, vibration, sound, text)
+        VALUES (1, '08:00', 'custom', '["Mon", "Wed"]', 0, 1, 'Бег')
+    """)
+    conn.execute("""
+        INSERT INTO reminders (habit_id, time, repeat, days, vibration, sound, text)
+        VALUES (99, '09:00', 'daily', '[]', 0, 1, 'Удалённая')
+    """)
+    conn.commit()
+    conn.close()
+
+    db.close_connections()
+    monkeypatch.setattr(db, "DB_PATH", str(path))
+    monkeypatch.setattr(db, "DURABILITY", "immediate")
+    yield path
+    db.close_connections()
+
+
+def test_upgrade_to_latest(baseline_db):
+    assert db.init_db()
+    conn = db.get_connection()
+    assert db.get_schema_version(conn) == len(db.MIGRATIONS)
+
+    # Миграция 2: дубли (habit_id, date) убраны
+    assert conn.execute("SELECT COUNT(*) FROM habit_logs WHERE habit_id=1").fetchone()[0] == 5
+    # Миграция 5: day заполнен для всех отметок
+    assert conn.execute("SELECT COUNT(*) FROM habit_logs WHERE day IS NULL").fetchone()[0] == 0
+
+    # Миграции 3/5/6: сводка и итоги совпадают с полным пересчётом
+    streak_rows = conn.execute("SELECT * FROM habit_streaks ORDER BY habit_id").fetchall()
+    rollup_rows = conn.execute("SELECT * FROM habit_rollups ORDER BY 1, 2, 3").fetchall()
+    assert [row["habit_id"] for row in streak_rows] == [1, 2]
+    assert {row["habit_id"] for row in rollup_rows} == {1, 2}
+    assert db.rebuild_streaks() and db.rebuild_rollups()
+    assert [tuple(row) for row in streak_rows] == [
+        tuple(row) for row in conn.execute("SELECT * FROM habit_streaks ORDER BY habit_id")]
+    assert [tuple(row) for row in rollup_rows] == [
+        tuple(row) for row in conn.execute("SELECT * FROM habit_rollups ORDER BY 1, 2, 3")]
+
+    # Миграции 8/9: дни — маска, напоминание удалённой привычки не перенесено
+    reminders = db.get_reminders()
+    assert [reminder["habit_id"] for reminder in reminders] == [1]
+    assert reminders[0]["days"] == 0b101
+    assert reminders[0]["enabled"] == 1
+    assert reminders[0]["next_fire_at"] is not None
+
+
+def test_upgrade_is_idempotent(baseline_db):
+    assert db.init_db()
+    db.close_connections()
+    assert db.init_db()
+    assert db.get_schema_version(db.get_connection()) == len(db.MIGRATIONS)
+
+
+def test_new_database_uses_incremental_vacuum(fresh_db):
+    conn = fresh_db.get_connection()
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def _vacuum_mode():
+    return db.get_connection().execute("PRAGMA auto_vacuum").fetchone()[0]
+
+
+def test_old_database_converted_by_maintenance(baseline_db):
+    # При запуске база не перестраивается — только в фоновом обслуживании
+    assert db.init_db()
+    assert _vacuum_mode() == 0
+    db.close_connections()
+
+    started = time.perf_counter()
+    assert db.run_maintenance(force=True) is not None
+    # Читатель уже открыт (maintenance_due): выход из WAL не ждёт busy_timeout
+    assert time.perf_counter() - started < 2
+    db.close_connections()
+    conn = sqlite3.connect(baseline_db)
+    assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    conn.close()
+
+
+def test_old_database_converted_outside_wal(baseline_db):
+    # Единственное подключение — перевод через выход из WAL
+    assert db.init_db()
+    db.compact()
+    with db.write_connection() as conn:
+        assert conn.execute("PRAGMA auto_vacuum").fetchone()[0] == 2
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
@@ -0,0 +1,175 @@
+"""Куча и таймер ReminderScheduler на поддельных часах"""
+from datetime import datetime
+
+import pytest
+
+import scheduler
+
+MONDAY = datetime(2026, 10, 19, 7, 0)
+
+
+class FakeTimer:
+    """threading.Timer, который срабатывает только по команде теста"""
+
+    def __init__(self, delay, fn):
+        self.delay = delay
+        self.fn = fn
+        self.started = False
+        self.cancelled = False
+        self.finished = False
+
+    def start(self):
+        self.started = True
+
+    def cancel(self):
+        self.cancelled = True
+
+    def run(self):
+        self.finished = True
+        self.fn()
+
+
+class Harness:
+    def __init__(self, now=MONDAY):
+        self.now = now
+        self.timers = []
+        self.notifier = scheduler.RecordingNotifier()
+        self.scheduler = scheduler.ReminderScheduler(
+            self.notifier, self.make_timer, lambda: self.now)
+
+    def make_timer(self, delay, fn):
+        timer = FakeTimer(delay, fn)
+        self.timers.append(timer)
+        return timer
+
+    @property
+    def armed(self):
+        live = [timer for timer in self.timers
+                if timer.started and not (timer.cancelled or timer.finished)]
+        assert len(live) <= 1, "взведено больше одного таймера"
+        return live[0] if live else None
+
+    def advance(self, when):
+        """Переводит часы и срабатывает таймер, если он уже должен был"""
+        self.now = when
+        timer = self.armed
+        if timer is not None and (timer.delay <= 0 or when >= self.fire_time):
+            timer.run()
+
+    @property
+    def fire_time(self):
+        due = self.scheduler.next_due()
+        return due[0] if due else None
+
+    def sent(self):
+        return [reminder["habit_id"] for reminder in self.notifier.sent]
+
+
+def _reminder(habit_id, time, repeat="daily", days=None, enabled=1, text=""):
+    return {"habit_id": habit_id, "time": time, "repeat": repeat, "days": days,
+            "enabled": enabled, "text": text or f"Привычка {habit_id}"}
+
+
+@pytest.fixture
+def harness():
+    return Harness()
+
+
+def test_load_arms_earliest(harness):
+    harness.scheduler.load([
+        _reminder(1, "08:00"),
+        _reminder(2, "07:30", "weekends"),
+        _reminder(3, "09:00", "custom", "Mon,Wed"),
+        _reminder(4, "bad"),
+        _reminder(5, "06:30", enabled=0),
+    ])
+    assert harness.fire_time == datetime(2026, 10, 19, 8, 0)
+    assert harness.armed.delay == 3600
+    assert len(harness.timers) == 1
+
+
+def test_update_rearms_and_cancels_old_timer(harness):
+    harness.scheduler.load([_reminder(1, "08:00"), _reminder(3, "09:00", "custom", 0b101)])
+    first = harness.armed
+
+    # 06:00 уже прошло — ближайшее срабатывание завтра
+    harness.scheduler.update(1, _reminder(1, "06:00"))
+    assert first.cancelled
+    assert harness.fire_time == datetime(2026, 10, 19, 9, 0)
+    assert harness.armed.delay == 7200
+
+    # Более позднее напоминание не трогает взведённый таймер
+    armed = harness.armed
+    harness.scheduler.update(6, _reminder(6, "23:00"))
+    assert harness.armed is armed
+
+
+def test_fire_notifies_due_and_reschedules(harness):
+    harness.scheduler.load([
+        _reminder(1, "08:00"),
+        _reminder(3, "09:00", "custom", "Mon,Wed"),
+        _reminder(5, "07:10", "weekdays"),
+    ])
+    harness.advance(datetime(2026, 10, 19, 7, 10))
+    assert harness.sent() == [5]
+    assert harness.fire_time == datetime(2026, 10, 19, 8, 0)
+
+    # Таймер опоздал: сработают все пропущенные сразу
+    harness.advance(datetime(2026, 10, 19, 9, 5))
+    assert harness.sent() == [5, 1, 3]
+    assert harness.fire_time == datetime(2026, 10, 20, 7, 10)
+    # Каждое напоминание снова в очереди, на свой следующий день
+    due = {habit_id: entry[0] for habit_id, entry in harness.scheduler._entries.items()}
+    assert due == {
+        1: datetime(2026, 10, 20, 8, 0),
+        3: datetime(2026, 10, 21, 9, 0),
+        5: datetime(2026, 10, 20, 7, 10),
+    }
+
+
+def test_remove_and_disable(harness):
+    harness.scheduler.load([_reminder(1, "08:00"), _reminder(2, "10:00")])
+    harness.scheduler.update(1, None)
+    assert harness.fire_time == datetime(2026, 10, 19, 10, 0)
+    harness.scheduler.update(2, _reminder(2, "10:00", enabled=0))
+    assert harness.fire_time is None
+    assert harness.armed is None
+
+    harness.advance(datetime(2026, 10, 20, 12, 0))
+    assert harness.sent() == []
+    # Устаревшие записи кучи выброшены
+    assert harness.scheduler._heap == []
+
+
+def test_many_updates_keep_heap_small(harness):
+    harness.scheduler.load([_reminder(1, "08:00")])
+    for minute in range(50):
+        harness.scheduler.update(1, _reminder(1, f"08:{minute:02d}"))
+    harness.advance(datetime(2026, 10, 19, 8, 49))
+    assert harness.sent() == [1]
+    assert len(harness.scheduler._heap) == 1
+
+
+def test_stop_cancels_timer(harness):
+    harness.scheduler.load([_reminder(1, "08:00")])
+    timer = harness.armed
+    harness.scheduler.stop()
+    assert timer.cancelled and harness.armed is None
+
+
+@pytest.mark.parametrize("repeat, days, expected", [
+    ("daily", None, datetime(2026, 10, 19, 7, 30)),
+    ("weekdays", None, datetime(2026, 10, 19, 7, 30)),
+    ("weekends", None, datetime(2026, 10, 24, 7, 30)),
+    ("custom", "Wed,Sun", datetime(2026, 10, 21, 7, 30)),
+    ("custom", ["Mon"], datetime(2026, 10, 19, 7, 30)),
+    ("custom", 0b1000000, datetime(2026, 10, 25, 7, 30)),
+    ("custom", [], None),
+])
+def test_reminder_fire(repeat, days, expected):
+    assert scheduler.reminder_fire(_reminder(1, "07:30", repeat, days), MONDAY) == expected
+
+
+def test_next_fire_is_strictly_later():
+    assert scheduler.next_fire("07:00", 0b1111111, MONDAY) == datetime(2026, 10, 20, 7, 0)
+    assert scheduler.next_fire("07:00", 0b1, MONDAY) == datetime(2026, 10, 26, 7, 0)
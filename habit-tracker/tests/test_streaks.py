@@ -0,0 +1,74 @@
+"""Пошаговое обновление habit_streaks / habit_rollups против полного пересчёта"""
+import random
+
+import pytest
+
+import streaks
+
+SCHEDULES = ("daily", "weekly", "weekdays", "weekends", "Mon,Wed,Fri")
+_EMPTY = (0, 0, 0, None, None)
+
+
+def _streak_row(cur, habit_id):
+    cur.execute("""
+        SELECT current_streak, longest_streak, total, last_done, first_done
+        FROM habit_streaks WHERE habit_id=?
+    """, (habit_id,))
+    row = cur.fetchone()
+    # Строка без отметок и отсутствующая строка равнозначны
+    return tuple(row) if row and row[2] else _EMPTY
+
+
+def _rollup_rows(cur, habit_id):
+    cur.execute("""
+        SELECT granularity, period, count FROM habit_rollups
+        WHERE habit_id=? ORDER BY granularity, period
+    """, (habit_id,))
+    return [tuple(row) for row in cur.fetchall()]
+
+
+def _stored_and_rebuilt(db, habit_id):
+    with db.write_connection() as conn:
+        cur = conn.cursor()
+        try:
+            stored = _streak_row(cur, habit_id), _rollup_rows(cur, habit_id)
+            db._rebuild_streaks(cur, habit_id)
+            db._rebuild_rollups(cur, habit_id)
+            rebuilt = _streak_row(cur, habit_id), _rollup_rows(cur, habit_id)
+        finally:
+            conn.rollback()
+            cur.close()
+    return stored, rebuilt
+
+
+@pytest.mark.parametrize("repeat", SCHEDULES)
+def test_incremental_matches_rebuild(fresh_db, repeat):
+    db = fresh_db
+    habit_id = db.add_habit(f"habit {repeat}", "", repeat)
+    rng = random.Random(repeat)
+    today = streaks.today_day()
+    done = set()
+    for step in range(300):
+        day = today - rng.randrange(70)
+        date = streaks.from_day(day).isoformat()
+        if day in done and rng.random() < 0.6:
+            assert db.delete_habit_log(habit_id, date)
+            done.discard(day)
+        else:
+            assert db.log_habit_done(habit_id, date)
+            done.add(day)
+        stored, rebuilt = _stored_and_rebuilt(db, habit_id)
+        assert stored == rebuilt, f"шаг {step}: {date}"
+
+
+def test_rebuild_matches_summarize(fresh_db):
+    db = fresh_db
+    habit_id = db.add_habit("a", "", "weekdays")
+    today = streaks.today_day()
+    days = sorted({today - k for k in (0, 1, 2, 3, 6, 7, 20, 21, 22)})
+    for day in days:
+        db.log_habit_done(habit_id, streaks.from_day(day).isoformat())
+    expected = streaks.summarize(days, streaks.Schedule.parse("weekdays"))
+    stored, _ = _stored_and_rebuilt(db, habit_id)
+    assert stored[0][:3] == (expected["current_streak"], expected["longest_streak"],
+                             expected["total"])
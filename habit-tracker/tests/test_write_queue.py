@@ -0,0 +1,107 @@
+"""Очередь записи (DURABILITY): чтение видит свои отметки, flush сохраняет"""
+import sqlite3
+
+import pytest
+
+import db
+import streaks
+
+
+@pytest.fixture
+def queue_db(fresh_db, monkeypatch):
+    # Таймер сброса не должен успеть сработать посреди теста
+    monkeypatch.setattr(db, "FLUSH_INTERVAL", 3600)
+    return fresh_db
+
+
+def _stored_logs(habit_id):
+    """Отметки, которые уже лежат в файле базы (мимо подключений db)"""
+    conn = sqlite3.connect(db.DB_PATH)
+    try:
+        return sorted(row[0] for row in conn.execute(
+            "SELECT date FROM habit_logs WHERE habit_id=?", (habit_id,)))
+    finally:
+        conn.close()
+
+
+def _days_ago(k):
+    return streaks.from_day(streaks.today_day() - k).isoformat()
+
+
+@pytest.mark.parametrize("mode", ["batched", "immediate"])
+def test_reads_see_check_ins(queue_db, monkeypatch, mode):
+    db = queue_db
+    habit_id = db.add_habit("Бег", None, "daily")
+    monkeypatch.setattr(db, "DURABILITY", mode)
+    db.get_dashboard()  # сводка в кэше — check_in считает в памяти
+
+    for k in (2, 1):
+        assert db.log_habit_done(habit_id, _days_ago(k))
+    habit = db.check_in(habit_id)
+    assert habit["done_today"] and habit["current_streak"] == 3
+
+    row = next(h for h in db.get_dashboard() if h["id"] == habit_id)
+    assert row["total_done"] == 3 and row["current_streak"] == 3
+    summary = db.get_habit_summary(habit_id)
+    assert summary["total_done"] == 3 and summary["done_today"]
+    stats = db.get_habit_stats(habit_id)
+    assert stats["total_done"] == 3 and stats["current_streak"] == 3
+    assert db.pending_writes() == 0
+
+
+def test_batched_writes_wait_for_flush(queue_db, monkeypatch):
+    db = queue_db
+    habit_id = db.add_habit("Бег", None, "daily")
+    monkeypatch.setattr(db, "DURABILITY", "batched")
+    db.get_dashboard()
+
+    db.check_in(habit_id)
+    db.check_in(habit_id)  # повтор той же отметки не удваивает очередь
+    assert db.pending_writes() == 1
+    # Сводка главного экрана берёт строку из очереди, не трогая базу
+    row = next(h for h in db.get_dashboard() if h["id"] == habit_id)
+    assert row["done_today"]
+    assert db.log_habit_done(habit_id, _days_ago(1)) is True
+    assert db.pending_writes() == 2
+    assert _stored_logs(habit_id) == []
+
+    db.flush()  # так делает on_pause
+    assert db.pending_writes() == 0
+    assert _stored_logs(habit_id) == [_days_ago(1), _days_ago(0)]
+
+
+def test_past_check_in_resets_dashboard_row(queue_db, monkeypatch):
+    db = queue_db
+    habit_id = db.add_habit("Бег", None, "daily")
+    monkeypatch.setattr(db, "DURABILITY", "batched")
+    db.get_dashboard()
+
+    db.check_in(habit_id)
+    db.log_habit_done(habit_id, _days_ago(1))
+    row = next(h for h in db.get_dashboard() if h["id"] == habit_id)
+    assert row["total_done"] == 2 and row["current_streak"] == 2
+
+
+def test_close_connections_saves_queue(queue_db, monkeypatch):
+    db = queue_db
+    habit_id = db.add_habit("Бег", None, "daily")
+    monkeypatch.setattr(db, "DURABILITY", "batched")
+    db.log_habit_done(habit_id)
+    assert _stored_logs(habit_id) == []
+
+    db.close_connections()  # так делает on_stop
+    assert db.pending_writes() == 0
+    assert _stored_logs(habit_id) == [_days_ago(0)]
+
+
+def test_switching_to_immediate_flushes(queue_db, monkeypatch):
+    db = queue_db
+    habit_id = db.add_habit("Бег", None, "daily")
+    monkeypatch.setattr(db, "DURABILITY", "batched")
+    db.log_habit_done(habit_id)
+
+    db.set_durability("immediate")
+    assert _stored_logs(habit_id) == [_days_ago(0)]
+    db.log_habit_done(habit_id, _days_ago(1))
+    assert db.pending_writes() == 0
+    assert _stored_logs(habit_id) == [_days_ago(1), _days_ago(0)]